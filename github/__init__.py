@@ -1,46 +1,253 @@
 """Module to interface with GitHub API"""
+# pylint: disable=too-many-lines
 
+import io
 import os
 import json
+import stat
 import time
 import uuid
 import shutil
 import zipfile
+import tarfile
+import fnmatch
 import tempfile
 import base64
+import hashlib
+import threading
 import urllib.parse
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from datetime import datetime, timedelta
 import nacl.public
 import nacl.encoding
 import requests
+from .cache import MemoryCache, DiskCache  # noqa: F401
+from .retry import RetryPolicy, SearchQuota, RateBudget  # noqa: F401
+from .graphql import GraphQLBatch, GraphQLError  # noqa: F401
+from .watcher import RunWatcher
+from .fanout import FanOut
+from .metrics import PrometheusMetrics, LoggingMetrics, redact_request, redact_url, \
+    request_event  # noqa: F401
 
+# Content of a resource which has not been fetched yet
+# (an empty payload is a valid content, it must not be fetched again)
+_NOT_FETCHED = None
 
+# Maximum number of results GitHub returns for a search
+SEARCH_LIMIT = 1000
+# Lower bound of the sharded searches (GitHub launch)
+SEARCH_START = datetime(2008, 1, 1)
+
+# Artifacts read for variables are kept in memory up to this size, then spooled to disk
+ARTIFACT_MEMORY_LIMIT = 8 * 1024 * 1024
+
+
+class GitHubSession:
+    """Connection-pooled HTTP session shared between GitHub clients"""
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, pool_size: int = 10, max_retries: int = 0, keep_alive: bool = True,
+                 hooks: list = None):
+        """Contructor
+        :param pool_size: Maximum number of connections kept per host
+        :param max_retries: Connection retries (DNS failures, refused connections)
+        :param keep_alive: Keep connections open between requests
+        :param hooks: Functions called with the event of each request
+                      (e.g. PrometheusMetrics, LoggingMetrics)"""
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=max_retries)
+        self._session = requests.Session()
+        self._session.mount('https://', self._adapter)
+        if not keep_alive:
+            self._session.headers['Connection'] = 'close'
+        # GitHub limits the code search separately (10 requests per minute)
+        self.search_quotas = {
+            'search': SearchQuota(),
+            'code_search': SearchQuota(limit=10, resource='code_search')}
+        self.rate_budget = RateBudget()
+        self.hooks = list(hooks or [])
+
+    @classmethod
+    def shared(cls, name: str = 'default', **kwargs) -> 'GitHubSession':
+        """Get a process-wide session (created on first use)
+        :param name: Session name
+        :param kwargs: Constructor arguments (only used on creation)
+        :returns: GitHubSession"""
+        with cls._registry_lock:
+            if name not in cls._registry:
+                cls._registry[name] = cls(**kwargs)
+            return cls._registry[name]
+
+    def request(self, method: str, **kwargs) -> requests.Response:
+        """Send a request through the connection pool
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response"""
+        return getattr(self._session, method)(**kwargs)
+
+    def emit(self, event: dict):
+        """Report an event to the hooks
+        :param event: Request or download event"""
+        for _hook in self.hooks:
+            _hook(event)
+
+    def stats(self) -> dict:
+        """Connection pool statistics
+        :returns: number of connections opened and reused"""
+        _opened = 0
+        _requests = 0
+        _pools = self._adapter.poolmanager.pools
+        for _key in list(_pools.keys()):
+            _pool = _pools.get(_key)
+            if _pool is None:
+                continue
+            _opened += _pool.num_connections
+            _requests += _pool.num_requests
+        return {'opened': _opened, 'reused': max(_requests - _opened, 0)}
+
+    def close(self):
+        """Close all the pooled connections"""
+        self._session.close()
+
+
+# pylint: disable=too-many-instance-attributes
 class GitHubRequests:
     """Parent class to execute GitHub API requests"""
-    def __init__(self, token: str, endpoint: str, debug: bool = False):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, endpoint: str, debug: bool = False,
+                 session: GitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None, ttl: float = None,
+                 content_cache: MemoryCache = None):
         """Contructor
         :param token: GitHub token (gotten from the user Settings page)
         :param endpoint: Resource endpoint
-        :param debug: Debug mode"""
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls (MemoryCache or DiskCache)
+        :param retry: Retry policy (default: RetryPolicy())
+        :param ttl: Lifetime in seconds of the resource attributes (default: forever)
+        :param content_cache: Resource attributes cache shared by the objects
+                              pointing to the same endpoint"""
         self._token = token
         self._endpoint = endpoint
         self.debug = debug
-        self._content = {}
+        self.session = session or GitHubSession()
+        self.cache = cache
+        self.retry = retry or RetryPolicy()
+        self.ttl = ttl
+        self.content_cache = content_cache
+        self._content = _NOT_FETCHED
+        self._fetched_at = 0
+        self._partial = False
         self.timeout = 3
 
     def __getattr__(self, key):
-        if not self._content:
-            self._content = self._call_api()
-        if key not in self._content:
+        _content = self._load()
+        if self._partial and key not in _content:
+            _content = self._load(refresh=True)
+        if key not in _content:
             raise AttributeError(
                 f"'{self.__class__.__name__}' object has no attribute '{key}'")
-        return self._content[key]
+        return _content[key]
 
     def __dir__(self):
-        if not self._content:
-            self._content = self._call_api()
         default_attrs = super().__dir__()
-        return list(default_attrs) + list(self._content.keys())
+        return list(default_attrs) + list(self._load().keys())
+
+    def _expired(self, fetched_at: float) -> bool:
+        """Check if resource attributes fetched at a given time are outdated
+        :param fetched_at: Fetch timestamp
+        :returns: True if outdated"""
+        return self.ttl is not None and time.time() - fetched_at > self.ttl
+
+    def _load(self, refresh: bool = False) -> dict:
+        """Get the resource attributes, fetching them if unknown or outdated
+        :param refresh: Fetch them even if known
+        :returns: Resource JSON"""
+        if not refresh and self._content is not _NOT_FETCHED \
+                and not self._expired(self._fetched_at):
+            return self._content
+        _cache_key = None
+        if self.content_cache is not None:
+            _cache_key = self._cache_key(self._endpoint)
+            _entry = self.content_cache.get(_cache_key)
+            if not refresh and _entry and not self._expired(_entry['fetched_at']):
+                self._content = _entry['content']
+                self._fetched_at = _entry['fetched_at']
+                self._partial = False
+                return self._content
+        self._content = self._call_api()
+        self._fetched_at = time.time()
+        self._partial = False
+        if _cache_key is not None:
+            self.content_cache.set(
+                _cache_key, {'content': self._content, 'fetched_at': self._fetched_at})
+        return self._content
+
+    def refresh(self):
+        """Fetch the resource attributes again
+        :returns: self"""
+        self._load(refresh=True)
+        return self
+
+    def prefetch(self, *fields):
+        """Fetch the resource attributes now (instead of on first access)
+        :param fields: Attributes to keep in memory (default: all of them);
+                       accessing another one fetches the resource again
+        :returns: self"""
+        _content = self._load()
+        if fields:
+            self._content = {_k: _v for _k, _v in _content.items() if _k in fields}
+            self._partial = True
+        return self
+
+    @staticmethod
+    def _identifier(content: dict) -> str:
+        """Get the constructor identifier of a resource from its JSON
+        :param content: Resource JSON
+        :returns: Resource endpoint"""
+        return urllib.parse.urlsplit(content['url']).path.lstrip('/')
+
+    @classmethod
+    def from_json(cls, token: str, content: dict, debug: bool = False, **kwargs):
+        """Create an object from an already fetched resource (no request is sent)
+
+        Attributes missing from the JSON (listings return partial objects)
+        trigger a single full fetch on first access
+        :param token: GitHub token
+        :param content: Resource JSON (e.g. an item of a listing)
+        :param debug: Debug mode
+        :param kwargs: Other constructor arguments (session, cache, retry)
+        :returns: Object"""
+        _object = cls(token, cls._identifier(content), debug, **kwargs)
+        _object._content = dict(content)
+        _object._fetched_at = time.time()
+        _object._partial = True
+        return _object
+
+    @staticmethod
+    def _reviews_approved(reviews: list) -> bool:
+        """Evaluate the latest review of each reviewer (comments are ignored)
+        :param reviews: Reviews in submission order
+        :returns: True if approved by someone and nobody requests changes"""
+        _latest = {}
+        for _review in reviews:
+            if _review.get('state') in ('APPROVED', 'CHANGES_REQUESTED', 'DISMISSED'):
+                _latest[(_review.get('user') or {}).get('login')] = _review['state']
+        _states = set(_latest.values())
+        return 'APPROVED' in _states and 'CHANGES_REQUESTED' not in _states
+
+    def _shared_options(self) -> dict:
+        """Options passed to the objects created by this one
+        :returns: constructor keyword arguments"""
+        return {
+            'debug': self.debug, 'session': self.session,
+            'cache': self.cache, 'retry': self.retry,
+            'ttl': self.ttl, 'content_cache': self.content_cache}
 
     def _prepare_url(self, resource: str = None, data: dict = None) -> dict:
         """Prepare request (add headers, format body)
@@ -75,48 +282,331 @@ class GitHubRequests:
         encrypted = sealed_box.encrypt(secret_value.encode("utf-8"))
         return base64.b64encode(encrypted).decode("utf-8")
 
-    def _execute_request(self, method: str, **kwargs) -> dict:
-        """Execute request and format Response
+    def _cache_key(self, url: str) -> str:
+        """Get the response cache key of a URL (the token is hashed)
+        :param url: Request URL
+        :returns: Cache key"""
+        _token = hashlib.sha256(self._token.encode('utf-8')).hexdigest()
+        return f"{_token}:{url}"
+
+    def _conditional_request(self, url: str, headers: dict) -> tuple:
+        """Look a GET request up in the cache and add the validators to its headers
+        :param url: Request URL
+        :param headers: Request headers (updated)
+        :returns: Cache key and cached entry (None if not cached)"""
+        _cache_key = self._cache_key(url)
+        _cached = self.cache.get(_cache_key)
+        if _cached:
+            if _cached.get('etag'):
+                headers['If-None-Match'] = _cached['etag']
+            if _cached.get('last_modified'):
+                headers['If-Modified-Since'] = _cached['last_modified']
+        return _cache_key, _cached
+
+    def _store_response(self, cache_key: str, response: requests.Response, body: dict):
+        """Cache a response if GitHub sent validators with it
+        :param cache_key: Cache key
+        :param response: Response
+        :param body: Response JSON dict"""
+        _etag = response.headers.get('ETag')
+        _last_modified = response.headers.get('Last-Modified')
+        if _etag or _last_modified:
+            self.cache.set(cache_key, {
+                'etag': _etag,
+                'last_modified': _last_modified,
+                'link': response.headers.get('Link'),
+                'body': body})
+
+    def _send(self, method: str, **kwargs) -> requests.Response:
+        """Send a request, retrying it according to the retry policy
         :param method: HTTP method
         :param kwargs: requests arguments
-        :returns: Response JSON dict"""
-        response = None
-        if self.debug:
-            print(f"call: {kwargs}")
+        :returns: Response"""
+        _attempt = 0
+        _start = time.monotonic() if self.session.hooks else 0
         while True:
+            _attempt += 1
             try:
-                response = getattr(requests, method)(**kwargs)
-                break
-            except requests.exceptions.ReadTimeout:
-                time.sleep(2)
+                response = self.session.request(method, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                _delay = self.retry.delay(method, _attempt, error=err)
+                if _delay is None:
+                    if self.session.hooks:
+                        self.session.emit(request_event(
+                            method, kwargs, time.monotonic() - _start, _attempt, error=err))
+                    raise
+            else:
+                self.session.rate_budget.update(response)
+                _delay = self.retry.delay(method, _attempt, response=response)
+                if _delay is None:
+                    if self.session.hooks:
+                        self.session.emit(request_event(
+                            method, kwargs, time.monotonic() - _start, _attempt,
+                            response=response))
+                    return response
+            if self.debug:
+                print(f"retry #{_attempt} in {_delay:.1f}s: {method.upper()} "
+                      f"{redact_url(kwargs['url'])}")
+            time.sleep(_delay)
+
+    def _fetch(self, method: str, **kwargs) -> tuple:
+        """Execute request and keep the Response (to read its headers)
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response JSON dict and Response"""
+        response = None
+        _cache_key = None
+        _cached = None
+        if self.cache is not None and method == 'get':
+            kwargs['headers'] = dict(kwargs['headers'])
+            _cache_key, _cached = self._conditional_request(kwargs['url'], kwargs['headers'])
+        if self.debug:
+            print(f"call: {redact_request(kwargs)}")
+        response = self._send(method, **kwargs)
         # pylint: disable=no-member
+        if _cached and response.status_code == requests.codes.not_modified:
+            if self.debug:
+                print("response: not modified (cached)")
+            if _cached.get('link') and 'Link' not in response.headers:
+                response.headers['Link'] = _cached['link']
+            return _cached['body'], response
         response.raise_for_status()
         if response.status_code == requests.codes.no_content:
             _return_value = {}
         else:
             _return_value = response.json()
+        if _cache_key is not None and response.status_code == requests.codes.ok:
+            self._store_response(_cache_key, response, _return_value)
         if self.debug:
             print(f"response: {_return_value}")
-        return _return_value
+        return _return_value, response
+
+    def _execute_request(self, method: str, **kwargs) -> dict:
+        """Execute request and format Response
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response JSON dict"""
+        return self._fetch(method, **kwargs)[0]
+
+    def _pages(self, url: str, prefetch: int = 0):
+        """Iterate over the pages of a listing following the Link headers (generator)
+
+        With prefetch, the number of pages is read from the first page 'last' Link,
+        then at most `prefetch` pages are fetched (or held in memory) at once.
+        Listings without 'last' Link (cursor-based) are always read page by page
+        :param url: First page URL
+        :param prefetch: Number of pages fetched concurrently (0: one page at a time)
+        :returns: Response JSON dict of each page"""
+        _body, _response = self._fetch('get', **self._prepare_url(url))
+        yield _body
+        _last = _response.links.get('last', {}).get('url')
+        _query = urllib.parse.parse_qs(urllib.parse.urlsplit(_last or '').query)
+        if prefetch and 'page' in _query:
+            yield from self._prefetch_pages(_last, prefetch)
+            return
+        _next = _response.links.get('next', {}).get('url')
+        while _next:
+            _body, _response = self._fetch('get', **self._prepare_url(_next))
+            yield _body
+            _next = _response.links.get('next', {}).get('url')
+
+    def _prefetch_pages(self, last: str, window: int):
+        """Fetch the pages 2 to last concurrently (generator yielding pages in order)
+        :param last: Last page URL
+        :param window: Maximum number of pages fetched (or held in memory) at once
+        :returns: Response JSON dict of each page"""
+        _url = urllib.parse.urlsplit(last)
+        _query = urllib.parse.parse_qs(_url.query)
+        _pages = int(_query['page'][0])
+        _futures = deque()
+        _next = 2
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            try:
+                while _next <= _pages or _futures:
+                    while _next <= _pages and len(_futures) < window:
+                        _query['page'] = [str(_next)]
+                        _page_url = urllib.parse.urlunsplit(
+                            _url._replace(query=urllib.parse.urlencode(_query, doseq=True)))
+                        _futures.append(executor.submit(
+                            self._execute_request, 'get', **self._prepare_url(_page_url)))
+                        _next += 1
+                    yield _futures.popleft().result()
+            finally:
+                for _future in _futures:
+                    _future.cancel()
+
+    def _paginate(self, resource: str, params: dict = None, key: str = None,
+                  max_items: int = None, per_page: int = 100, prefetch: int = 0,
+                  endpoint: str = None):
+        """Iterate over the items of a paginated listing (generator)
+
+        Pages are followed through their 'next' Link so no empty page is requested
+        :param resource: Resource to list (prefixed by the class endpoint)
+        :param params: Query parameters (None values are skipped)
+        :param key: Key holding the items in wrapped responses (workflow_runs, artifacts...)
+        :param max_items: Stop after this number of items
+        :param per_page: Page size (max 100)
+        :param prefetch: Number of pages fetched concurrently (0: one page at a time)
+        :param endpoint: Endpoint prefix (default: the class endpoint)
+        :returns: items"""
+        _params = {'per_page': per_page}
+        _params.update({_k: _v for _k, _v in (params or {}).items() if _v is not None})
+        _endpoint = self._endpoint if endpoint is None else endpoint
+        _url = f"{_endpoint}/{resource}" if _endpoint else resource
+        _url += f"?{urllib.parse.urlencode(_params)}"
+        _count = 0
+        for _page in self._pages(_url, prefetch):
+            for _item in (_page[key] if key else _page):
+                if max_items is not None and _count >= max_items:
+                    return
+                yield _item
+                _count += 1
+            if max_items is not None and _count >= max_items:
+                return
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _iter_search(self, endpoint: str, query: dict, max_items: int = None,
+                     per_page: int = 100, stop_on_incomplete: bool = False):
+        """Stream GitHub Search API results as the pages arrive (generator)
+
+        The search stops after the last page or once total_count items are read.
+        Requests are throttled by the session search quota
+        :param endpoint: Resource to search for
+        :param query: Query dictionary
+        :param max_items: Stop after this number of items (GitHub caps searches to SEARCH_LIMIT)
+        :param per_page: Page size (max 100)
+        :param stop_on_incomplete: Also stop after a page flagged with incomplete_results
+                                   (the search timed out on GitHub side)
+        :returns: items"""
+        _params = urllib.parse.urlencode({'per_page': per_page, 'q': self._search_query(query)})
+        _next = f"search/{endpoint}?{_params}"
+        _quota = self._search_quota(endpoint)
+        _count = 0
+        while _next:
+            _quota.acquire()
+            _page, _response = self._fetch('get', **self._prepare_url(_next))
+            _quota.update(_response)
+            for _item in _page['items']:
+                if max_items is not None and _count >= max_items:
+                    return
+                yield _item
+                _count += 1
+            if stop_on_incomplete and _page.get('incomplete_results'):
+                if self.debug:
+                    print(f"search: incomplete results after {_count} items")
+                return
+            if _count >= min(_page.get('total_count', SEARCH_LIMIT), SEARCH_LIMIT):
+                return
+            _next = _response.links.get('next', {}).get('url')
+
+    def _search_quota(self, endpoint: str) -> SearchQuota:
+        """Get the session quota of a search endpoint
+        :param endpoint: Resource to search for
+        :returns: SearchQuota"""
+        return self.session.search_quotas['code_search' if endpoint == 'code' else 'search']
+
+    @staticmethod
+    def _search_query(query: dict) -> str:
+        """Build a search query string
+        :param query: Query dictionary (qualifier: value, '' for free text)
+        :returns: Query string"""
+        return ' '.join([f"{k}:{v}" if k else v for k, v in query.items()])
+
+    @staticmethod
+    def _search_range(query: dict, key: str, start: datetime, end: datetime) -> dict:
+        """Restrict a search query to a date range
+        :param query: Query dictionary
+        :param key: Date qualifier
+        :param start: Range start
+        :param end: Range end (inclusive)
+        :returns: Query dictionary"""
+        return {**query, key: f"{start:%Y-%m-%dT%H:%M:%SZ}..{end:%Y-%m-%dT%H:%M:%SZ}"}
+
+    @staticmethod
+    def _split_range(start: datetime, end: datetime) -> tuple:
+        """Split a date range in two halves (ranges are inclusive, to the second)
+        :param start: Range start
+        :param end: Range end
+        :returns: Two (start, end) ranges"""
+        _middle = (start + (end - start) / 2).replace(microsecond=0)
+        return (start, _middle), (_middle + timedelta(seconds=1), end)
+
+    def _search_count(self, endpoint: str, query: dict) -> int:
+        """Get the number of results of a search (a single one-item page is read)
+        :param endpoint: Resource to search for
+        :param query: Query dictionary
+        :returns: total_count"""
+        _params = urllib.parse.urlencode({'per_page': 1, 'q': self._search_query(query)})
+        _quota = self._search_quota(endpoint)
+        _quota.acquire()
+        _page, _response = self._fetch('get', **self._prepare_url(f"search/{endpoint}?{_params}"))
+        _quota.update(_response)
+        return _page['total_count']
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _search_shards(self, endpoint: str, query: dict, key: str, start: datetime,
+                       end: datetime, executor: ThreadPoolExecutor) -> list:
+        """Split a date range in halves until each part has less than SEARCH_LIMIT results
+        :param endpoint: Resource to search for
+        :param query: Query dictionary
+        :param key: Date qualifier used as partition key (created, updated, closed...)
+        :param start: Range start
+        :param end: Range end (inclusive)
+        :param executor: Executor counting the results of the ranges concurrently
+        :returns: Non-empty (start, end) ranges"""
+        def _count(_start, _end):
+            return executor.submit(
+                self._search_count, endpoint, self._search_range(query, key, _start, _end))
+        _shards = []
+        _pending = {_count(start, end): (start, end)}
+        while _pending:
+            for _future in wait(_pending, return_when=FIRST_COMPLETED).done:
+                _start, _end = _pending.pop(_future)
+                _total = _future.result()
+                if _total > SEARCH_LIMIT and _end - _start > timedelta(seconds=1):
+                    for _range in self._split_range(_start, _end):
+                        _pending[_count(*_range)] = _range
+                elif _total:
+                    if _total > SEARCH_LIMIT and self.debug:
+                        print(f"search: {_total} results at {_start}, truncated")
+                    _shards.append((_start, _end))
+        return sorted(_shards)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _sharded_search(self, endpoint: str, query: dict, key: str = 'created',
+                        start: datetime = None, end: datetime = None, max_workers: int = 4):
+        """Search past the SEARCH_LIMIT cap by splitting the query into date ranges (generator)
+
+        Shards are searched concurrently (within the session search quota) and
+        the items are yielded shard by shard, deduplicated by id
+        :param endpoint: Resource to search for (issues, commits...)
+        :param query: Query dictionary
+        :param key: Date qualifier used as partition key (created, updated, closed...)
+        :param start: Range start (default: SEARCH_START)
+        :param end: Range end (default: now)
+        :param max_workers: Number of search requests sent concurrently
+        :returns: items"""
+        _start = start or SEARCH_START
+        _end = end or datetime.utcnow().replace(microsecond=0)
+        _seen = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            _futures = [
+                executor.submit(lambda _query: list(self._iter_search(endpoint, _query)),
+                                self._search_range(query, key, *_shard))
+                for _shard in self._search_shards(endpoint, query, key, _start, _end, executor)]
+            for _future in as_completed(_futures):
+                for _item in _future.result():
+                    if _item['id'] in _seen:
+                        continue
+                    _seen.add(_item['id'])
+                    yield _item
 
     def _search_api(self, endpoint: str, query: dict) -> dict:
         """Request GitHub Search API (protected)
         :param endpoint: Resource to search for
         :param query: Query dictionary
         :returns: GitHub API JSON Response"""
-        _str_query = ' '.join([f"{k}:{v}" if k else v for k, v in query.items()])
-        _page = 1
-        _results = []
-        while True:
-            _args = f"q={urllib.parse.quote_plus(_str_query)}&per_page=100&page={_page}"
-            _request = self._prepare_url(f"search/{endpoint}?{_args}")
-            _return_value = self._execute_request("get", **_request)
-            _return_items = _return_value['items']
-            _results += _return_items
-            if _page == 10 or not _return_items:
-                break
-            _page += 1
-        return _results
+        return list(self._iter_search(endpoint, query))
 
     # pylint: disable=inconsistent-return-statements
     def _call_api(self, resource: str = None, data: dict = None, method: str = 'get') -> dict:
@@ -131,21 +621,187 @@ class GitHubRequests:
         _request = self._prepare_url(_endpoint, data)
         return self._execute_request(method.lower(), **_request)
 
-    def download(self, url: str, output_file: str):
-        """Download object from GitHub
+    def graphql(self, query: str, variables: dict = None) -> dict:
+        """Request GitHub GraphQL API
+        :param query: GraphQL query
+        :param variables: Query variables
+        :returns: GraphQL JSON Response (data and errors)"""
+        _request = self._prepare_url('graphql', {'query': query, 'variables': variables or {}})
+        return self._execute_request('post', **_request)
+
+    def batch(self, **kwargs) -> GraphQLBatch:
+        """Create a GraphQL batch to read many resources in a few requests
+        :param kwargs: GraphQLBatch arguments (max_aliases, max_nodes, per_page)
+        :returns: GraphQLBatch"""
+        return GraphQLBatch(self, **kwargs)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def download(self, url: str, output_file: str, chunk_size: int = 1024 * 1024,
+                 segments: int = 1, sha256: str = None, progress=None,
+                 max_resumes: int = 5) -> str:
+        """Download object from GitHub (streamed to disk)
+
+        Dropped connections are resumed with Range requests when the server supports
+        them, and large files can be downloaded as parallel ranged segments. The data
+        is written to output_file.part, moved in place once complete and verified
         :param url: URL
-        :param output_file: local file name"""
+        :param output_file: local file name
+        :param chunk_size: Size in bytes of the chunks read and written
+        :param segments: Number of ranged segments downloaded in parallel
+        :param sha256: Expected SHA-256 hex digest (ValueError if it does not match)
+        :param progress: Function called with the bytes downloaded and the total size
+                         (None if unknown) after each chunk
+        :param max_resumes: Maximum number of resumes after dropped connections
+        :returns: SHA-256 hex digest of the file"""
+        _start = time.monotonic() if self.session.hooks else 0
         _request = self._prepare_url(url)
         if self.debug:
-            print(f"call: {_request}")
-        response = requests.get(**_request)
-        totalbits = 0
-        if response.status_code == 200:
-            with open(output_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        totalbits += 1024
-                        f.write(chunk)
+            print(f"call: {redact_request(_request)}")
+        response = self._send('get', stream=True, **_request)
+        response.raise_for_status()
+        _transfer = self._download_state(_request, response, chunk_size, max_resumes)
+        _transfer['progress'] = progress
+        _part = f"{output_file}.part"
+        try:
+            _digest = self._download_part(_transfer, response, _part, segments)
+            if _transfer['total'] is not None and _transfer['done'] != _transfer['total']:
+                raise IOError(
+                    f"incomplete download: {_transfer['done']}/{_transfer['total']} bytes")
+            if sha256 and _digest.hexdigest() != sha256.lower():
+                raise ValueError(f"SHA-256 mismatch for {url}: {_digest.hexdigest()}")
+            os.replace(_part, output_file)
+        except Exception as err:
+            if os.path.exists(_part):
+                os.remove(_part)
+            self._download_event(url, _transfer, time.monotonic() - _start, err)
+            raise
+        self._download_event(url, _transfer, time.monotonic() - _start)
+        return _digest.hexdigest()
+
+    def _download_event(self, url: str, transfer: dict, duration: float,
+                        error: Exception = None):
+        """Report a download to the session hooks
+        :param url: URL
+        :param transfer: Download state
+        :param duration: Time in seconds spent downloading
+        :param error: Exception which stopped the download (if any)"""
+        if not self.session.hooks:
+            return
+        _event = request_event('get', {'url': self._prepare_url(url)['url']}, duration, 1)
+        _event.update({
+            'kind': 'download', 'status': transfer['status'],
+            'error': None if error is None else type(error).__name__,
+            'retries': transfer['resumes'], 'response_bytes': transfer['done']})
+        self.session.emit(_event)
+
+    def _download_part(self, transfer: dict, response: requests.Response, output_file: str,
+                       segments: int):
+        """Download a file sequentially or as parallel ranged segments
+        :param transfer: Download state
+        :param response: Streamed response of the first request
+        :param output_file: local file name
+        :param segments: Number of ranged segments downloaded in parallel
+        :returns: hashlib SHA-256 object of the data"""
+        _digest = hashlib.sha256()
+        if segments > 1 and transfer['ranges'] \
+                and (transfer['total'] or 0) >= segments * transfer['chunk_size']:
+            response.close()
+            self._download_segments(transfer, output_file, segments)
+            with open(output_file, 'rb') as fd:
+                for _chunk in iter(lambda: fd.read(transfer['chunk_size']), b''):
+                    _digest.update(_chunk)
+        else:
+            with open(output_file, 'wb') as fd:
+                self._download_range(transfer, fd, 0, response=response, digest=_digest)
+        return _digest
+
+    @staticmethod
+    def _download_state(request: dict, response: requests.Response, chunk_size: int,
+                        max_resumes: int) -> dict:
+        """Initialize the state of a download from its first response
+        :param request: Request dict
+        :param response: Streamed response
+        :param chunk_size: Size in bytes of the chunks read and written
+        :param max_resumes: Maximum number of resumes after dropped connections
+        :returns: Download state"""
+        _headers = dict(request['headers'])
+        if urllib.parse.urlsplit(response.url).netloc != \
+                urllib.parse.urlsplit(request['url']).netloc:
+            # redirected to a signed storage URL which rejects the GitHub token
+            _headers.pop('Authorization')
+        _total = None
+        if 'Content-Length' in response.headers and not response.headers.get('Content-Encoding'):
+            _total = int(response.headers['Content-Length'])
+        return {
+            'url': response.url, 'headers': _headers, 'chunk_size': chunk_size,
+            'ranges': response.headers.get('Accept-Ranges') == 'bytes',
+            'max_resumes': max_resumes, 'progress': None, 'status': response.status_code,
+            'done': 0, 'total': _total, 'resumes': 0, 'lock': threading.Lock()}
+
+    def _download_segments(self, transfer: dict, output_file: str, segments: int):
+        """Download a file as parallel ranged segments
+        :param transfer: Download state
+        :param output_file: local file name (preallocated)
+        :param segments: Number of segments"""
+        _size = -(-transfer['total'] // segments)
+        with open(output_file, 'wb') as fd:
+            fd.truncate(transfer['total'])
+
+        def _segment(start):
+            with open(output_file, 'r+b') as fd:
+                self._download_range(
+                    transfer, fd, start, min(start + _size, transfer['total']) - 1)
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            for _future in [executor.submit(_segment, _start)
+                            for _start in range(0, transfer['total'], _size)]:
+                _future.result()
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def _download_range(self, transfer: dict, fd, start: int, end: int = None,
+                        response: requests.Response = None, digest=None):
+        """Write a byte range of a download to a file, resuming dropped connections
+        :param transfer: Download state (url, headers, chunk_size, progress...)
+        :param fd: Output file object
+        :param start: First byte
+        :param end: Last byte (None: until the end)
+        :param response: Response already streaming the range (if any)
+        :param digest: hashlib object updated with the data (sequential downloads only)"""
+        _position = start
+        _resumes = 0
+        while True:
+            try:
+                if response is None:
+                    response = self._send(
+                        'get', url=transfer['url'], timeout=self.timeout, stream=True,
+                        headers={**transfer['headers'],
+                                 'Range': f"bytes={_position}-{'' if end is None else end}"})
+                    response.raise_for_status()
+                    if response.status_code != requests.codes.partial_content:
+                        raise IOError(f"range requests not supported by {transfer['url']}")
+                fd.seek(_position)
+                for _chunk in response.iter_content(chunk_size=transfer['chunk_size']):
+                    fd.write(_chunk)
+                    if digest is not None:
+                        digest.update(_chunk)
+                    _position += len(_chunk)
+                    with transfer['lock']:
+                        transfer['done'] += len(_chunk)
+                        if transfer['progress']:
+                            transfer['progress'](transfer['done'], transfer['total'])
+                return
+            except (requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ConnectionError) as err:
+                if not transfer['ranges'] or _resumes >= transfer['max_resumes']:
+                    raise
+                _resumes += 1
+                with transfer['lock']:
+                    transfer['resumes'] += 1
+                if self.debug:
+                    print(f"resume #{_resumes} at byte {_position}: {err}")
+            finally:
+                if response is not None:
+                    response.close()
+            response = None
 
     def add_variable(self, name: str, value: str):
         """Add variable
@@ -168,11 +824,71 @@ class GitHubRequests:
         :returns: variable dict"""
         return self._call_api("/actions/variables")['variables']
 
+    def iter_variables(self, per_page: int = 30, max_items: int = None):
+        """List all the variables (generator to handle pagination)
+        :param per_page: Page size (max 30 for variables)
+        :param max_items: Stop after this number of variables
+        :returns: variable dict"""
+        yield from self._paginate(
+            "actions/variables", key='variables', max_items=max_items, per_page=min(per_page, 30))
+
+    def update_variable(self, name: str, value: str):
+        """Update variable
+        :param name: variable name to update
+        :param value: variable value"""
+        self._call_api(
+            f"/actions/variables/{name}",
+            {'name': name, 'value': value},
+            "patch")
+
+    def sync_variables(self, desired: dict, delete: bool = True, dry_run: bool = False,
+                       max_workers: int = 8) -> dict:
+        """Make the variables match a desired state (only the differences are applied)
+        :param desired: Dict of {name: value}
+        :param delete: Delete the variables missing from the desired state
+        :param dry_run: Only compute the changes
+        :param max_workers: Number of changes applied concurrently
+        :returns: Plan (variables to create, update and delete)
+                  and the exception raised by each failed change"""
+        _current = {_variable['name'].upper(): _variable for _variable in self.iter_variables()}
+        _plan = {'create': {}, 'update': {}, 'delete': [], 'errors': {}}
+        for _name, _value in desired.items():
+            _variable = _current.pop(_name.upper(), None)
+            if _variable is None:
+                _plan['create'][_name] = _value
+            elif _variable['value'] != _value:
+                _plan['update'][_variable['name']] = _value
+        if delete:
+            _plan['delete'] = sorted(_variable['name'] for _variable in _current.values())
+        if dry_run:
+            return _plan
+        _changes = [(self.add_variable, _name, _value) for _name, _value in _plan['create'].items()]
+        _changes += [(self.update_variable, _name, _value)
+                     for _name, _value in _plan['update'].items()]
+        _changes += [(self.delete_variable, _name) for _name in _plan['delete']]
+
+        def _apply(_change):
+            try:
+                _change[0](*_change[1:])
+            except requests.exceptions.RequestException as err:
+                _plan['errors'][_change[1]] = err
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_apply, _changes))
+        return _plan
+
     def list_secrets(self) -> dict:
         """List secrets
         :returns: secret dict"""
         return self._call_api("/actions/secrets")['secrets']
 
+    def iter_secrets(self, per_page: int = 100, max_items: int = None):
+        """List all the secrets (generator to handle pagination)
+        :param per_page: Page size (max 100)
+        :param max_items: Stop after this number of secrets
+        :returns: secret dict"""
+        yield from self._paginate(
+            "actions/secrets", key='secrets', max_items=max_items, per_page=per_page)
+
     def delete_runner(self, runner_id: int):
         """Delete runner
         :param runner_id: runner to delete"""
@@ -185,102 +901,466 @@ class GitHubRequests:
         :returns: runner dict"""
         return self._call_api("/actions/runners")['runners']
 
+    def iter_runners(self, name: str = None, per_page: int = 100, max_items: int = None):
+        """List all the runners (generator to handle pagination)
+        :param name: Only list the runners with this name
+        :param per_page: Page size (max 100)
+        :param max_items: Stop after this number of runners
+        :returns: runner dict"""
+        yield from self._paginate(
+            "actions/runners", {'name': name}, key='runners', max_items=max_items,
+            per_page=per_page)
+
     def get_issues(self) -> dict:
         """List issues
         :returns: issues dict"""
         return self._call_api("/issues")
 
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def iter_issues(self, state: str = None, since: str = None, labels: list = None,
+                    per_page: int = 100, max_items: int = None):
+        """List all the issues (generator to handle pagination)
+        :param state: Status (open, closed, all; default: open)
+        :param since: Only list the issues updated after this ISO 8601 timestamp
+        :param labels: Only list the issues having all these labels
+        :param per_page: Page size (max 100)
+        :param max_items: Stop after this number of issues
+        :returns: issue dict"""
+        _params = {'state': state, 'since': since, 'labels': ','.join(labels) if labels else None}
+        yield from self._paginate("issues", _params, max_items=max_items, per_page=per_page)
+
 
 class GitHubOrganization(GitHubRequests):
     """Class to manage Organizations via GitHub API"""
-    def __init__(self, token: str, organization: str, debug: bool = False):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, organization: str, debug: bool = False,
+                 session: GitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None, ttl: float = None,
+                 content_cache: MemoryCache = None):
         """Contructor
         :param token: GitHub token (needs the admin:org rights)
         :param organization: Organization name
-        :param debug: Debug mode"""
-        super().__init__(token, f"orgs/{organization}", debug)
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls
+        :param retry: Retry policy (default: RetryPolicy())
+        :param ttl: Lifetime in seconds of the resource attributes (default: forever)
+        :param content_cache: Resource attributes cache shared between objects"""
+        super().__init__(token, f"orgs/{organization}", debug, session, cache, retry,
+                         ttl, content_cache)
         self.name = organization
 
-    def list_repositories(self) -> dict:
+    @staticmethod
+    def _identifier(content: dict) -> str:
+        """Get the organization name from its JSON
+        :param content: Organization JSON
+        :returns: Organization name"""
+        return content['login']
+
+    def list_repositories(self, prefetch: int = 0) -> dict:
         """List organization repositories (generator to handle pagination)
+        :param prefetch: Number of pages fetched concurrently (0: one page at a time)
         :returns: repository infos"""
-        _page = 1
-        while True:
-            _repos = self._call_api(f"/repos?per_page=100&page={_page}")
-            if len(_repos) == 0:
-                break
-            for _repo in _repos:
-                yield GitHubRepository(self._token, _repo['full_name'])
-            _page += 1
+        for _repo in self._paginate("repos", prefetch=prefetch):
+            yield GitHubRepository.from_json(self._token, _repo, **self._shared_options())
+
+    def get_repositories(self, names: list) -> dict:
+        """Get many repositories of the organization with batched GraphQL queries
+        :param names: Repository names (with or without the organization prefix)
+        :returns: GitHubRepository of each name (None if not found)"""
+        _batch = self.batch()
+        _keys = {
+            _name: _batch.repository(_name if '/' in _name else f"{self.name}/{_name}")
+            for _name in names}
+        _results = _batch.execute()
+        return {
+            _name: GitHubRepository.from_json(
+                self._token, _results[_key], **self._shared_options())
+            if _results[_key] else None
+            for _name, _key in _keys.items()}
+
+    def add_repositories_secrets(self, secrets: dict, repositories: list = None,
+                                 max_workers: int = 8) -> dict:
+        """Add secrets to many repositories of the organization
+        (repositories are processed concurrently, each public key is fetched once)
+        :param secrets: Dict of {name: value}
+        :param repositories: Repository names, with or without the organization prefix
+                             (default: all the repositories)
+        :param max_workers: Number of repositories processed concurrently
+        :returns: Secret in JSON format (or the exception raised) of each name,
+                  for each repository full name (the exception raised if the whole
+                  repository failed)"""
+        _fan_out = self.fan_out(
+            lambda _repository: _repository.add_secrets(secrets, max_workers=1),
+            repositories, max_workers)
+        return {**_fan_out.run(), **_fan_out.errors}
+
+    def fan_out(self, func, repositories: list = None, max_workers: int = 8,
+                reserve: int = 0, progress=None) -> FanOut:
+        """Apply a function to many repositories of the organization concurrently
+        :param func: Function called with each GitHubRepository
+        :param repositories: Repository names, with or without the organization prefix
+                             (default: all the repositories, streamed from the listing)
+        :param max_workers: Number of repositories processed concurrently
+        :param reserve: Number of API requests kept when the shared quota runs low
+        :param progress: Function called with the FanOut after each repository
+        :returns: FanOut (iterate over it to get the results as they finish)"""
+        if repositories is None:
+            _repositories = self.list_repositories()
+        else:
+            _repositories = (
+                GitHubRepository(self._token, _name if '/' in _name else f"{self.name}/{_name}",
+                                 **self._shared_options())
+                for _name in repositories)
+        return FanOut(func, _repositories, self.session.rate_budget, max_workers=max_workers,
+                      reserve=reserve, progress=progress)
 
-    def get_pull_requests(self, state: str, author: str = None) -> dict:
+    def get_pull_requests(self, state: str, author: str = None, sharded: bool = False) -> dict:
         """Get pull requests at organization level
         :param state: Status (open, closed)
         :param author: Author (GitHub login)
+        :param sharded: Split the search by creation date to get more than SEARCH_LIMIT results
         :returns: GitHub API JSON Response"""
         _query = {'state': state, 'type': 'pr', 'org': self.name}
         if author:
             _query['author'] = author
-        _results = self._search_api("issues", _query)
+        if sharded:
+            _results = self._sharded_search("issues", _query)
+        else:
+            _results = self._search_api("issues", _query)
         return [_result for _result in _results if _result['locked'] is False]
 
+    def iter_pull_requests(self, state: str, author: str = None, max_items: int = None):
+        """Stream pull requests at organization level (generator)
+        :param state: Status (open, closed)
+        :param author: Author (GitHub login)
+        :param max_items: Stop after this number of search results
+        :returns: GitHub API JSON of each pull request"""
+        _query = {'state': state, 'type': 'pr', 'org': self.name}
+        if author:
+            _query['author'] = author
+        for _result in self._iter_search("issues", _query, max_items=max_items,
+                                         stop_on_incomplete=True):
+            if _result['locked'] is False:
+                yield _result
+
+    def pull_requests_approved(self, pull_requests: list, max_workers: int = 4) -> dict:
+        """Check the approval of many pull requests (e.g. get_pull_requests results)
+
+        All the reviews are read with batched GraphQL queries. A pull request
+        is approved when, considering the latest review of each reviewer,
+        someone approves it and nobody requests changes
+        :param pull_requests: Pull requests (search results or pull request JSON)
+        :param max_workers: Number of GraphQL queries sent concurrently
+        :returns: approval status of each pull request URL"""
+        _batch = self.batch()
+        _keys = {}
+        for _pr in pull_requests:
+            if 'repository_url' in _pr:
+                _repository = _pr['repository_url'].split('/repos/', 1)[1]
+            else:
+                _repository = _pr['base']['repo']['full_name']
+            _keys[_pr['html_url']] = _batch.reviews(_repository, _pr['number'])
+        _results = _batch.execute(max_workers)
+        return {
+            _url: self._reviews_approved(_results[_key] or [])
+            for _url, _key in _keys.items()}
+
     def find(self, pattern: str, path: str = None) -> dict:
         """Get pull requests at organization level
         :param state: Status (open, closed)
         :param author: Author (GitHub login)
         :returns: GitHub API JSON Response"""
+        return self._search_api("code", self._find_query(pattern, path))
+
+    def iter_find(self, pattern: str, path: str = None, max_items: int = None):
+        """Stream code search results at organization level (generator)
+        :param pattern: Text to search for
+        :param path: File path or name
+        :param max_items: Stop after this number of results
+        :returns: GitHub API JSON of each result"""
+        yield from self._iter_search("code", self._find_query(pattern, path), max_items=max_items,
+                                     stop_on_incomplete=True)
+
+    def _find_query(self, pattern: str, path: str = None) -> dict:
+        """Build a code search query
+        :param pattern: Text to search for
+        :param path: File path or name
+        :returns: Query dictionary"""
         _query = {'': pattern, 'org': self.name, 'in': 'file'}
         if path:
             if '/' in path:
                 _query['path'] = path
             else:
                 _query['filename'] = path
-        return self._search_api("code", _query)
+        return _query
 
 
+# pylint: disable=too-many-public-methods
 class GitHubRepository(GitHubRequests):
     """Class to manage Repositories via GitHub API"""
-    def __init__(self, token: str, repository: str, debug: bool = False):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, repository: str, debug: bool = False,
+                 session: GitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None, ttl: float = None,
+                 content_cache: MemoryCache = None):
         """Contructor
         :param token: GitHub token (needs the repo rights)
         :param repository: repository name
-        :param debug: Debug mode"""
-        super().__init__(token, f"repos/{repository}", debug)
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls
+        :param retry: Retry policy (default: RetryPolicy())
+        :param ttl: Lifetime in seconds of the resource attributes (default: forever)
+        :param content_cache: Resource attributes cache shared between objects"""
+        super().__init__(token, f"repos/{repository}", debug, session, cache, retry,
+                         ttl, content_cache)
         self.name = repository
+        self._artifacts = {}
+        self._public_key = None
+        self._secrets_lock = threading.Lock()
+
+    @staticmethod
+    def _identifier(content: dict) -> str:
+        """Get the repository full name from its JSON
+        :param content: Repository JSON
+        :returns: Repository full name"""
+        return content['full_name']
 
-    def clone(self, destination: str = None, ref: str = None):
+    def clone(self, destination: str = None, ref: str = None, archive: str = 'zip',
+              paths: list = None):
         """Clone a remote repository locally
+
+        The archive entries are extracted straight to their final path (without the
+        archive top-level directory). The tarball is streamed from the response and
+        never hits the disk; the zipball needs a temporary file (random access)
         :param destination: local destination directory
-        :param ref: remote branch or tag to clone"""
-        destination = destination or os.path.join(os.getcwd(), self.name)
+        :param ref: remote branch or tag to clone
+        :param archive: Archive format (zip or tar)
+        :param paths: Only extract the files matching one of these globs
+                      (relative to the repository root, e.g. 'src/*')"""
+        destination = os.path.abspath(destination or os.path.join(os.getcwd(), self.name))
         ref = ref or self.default_branch
-        archive_dir = None
-        with tempfile.NamedTemporaryFile(suffix=".zip") as temp_file:
-            self.download(self._prepare_url(f"/zipball/{ref}"), temp_file.name)
-            with zipfile.ZipFile(temp_file.name, 'r') as zip_ref:
-                archive_dir = zip_ref.namelist()[0].split('/')[0]
-                zip_ref.extractall(destination)
-        shutil.copytree(os.path.join(destination, archive_dir), destination,
-                        dirs_exist_ok=True)
-        shutil.rmtree(os.path.join(destination, archive_dir))
-
-    def list_runs(self, **kwargs) -> dict:
+        if archive == 'tar':
+            _request = self._prepare_url(f"{self._endpoint}/tarball/{ref}")
+            response = self._send('get', stream=True, **_request)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            with response, tarfile.open(fileobj=response.raw, mode='r|*') as tar_ref:
+                for _member in tar_ref:
+                    _path = self._clone_path(destination, _member.name, paths)
+                    if _path is None:
+                        continue
+                    if _member.isdir():
+                        os.makedirs(_path, exist_ok=True)
+                    elif _member.issym():
+                        self._clone_symlink(destination, _path, _member.linkname)
+                    elif _member.isfile():
+                        self._clone_file(tar_ref.extractfile(_member), _path, _member.mode)
+            return
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            _zip_file = os.path.join(tmpdirname, 'archive.zip')
+            self.download(f"{self._endpoint}/zipball/{ref}", _zip_file)
+            with zipfile.ZipFile(_zip_file, 'r') as zip_ref:
+                for _info in zip_ref.infolist():
+                    _path = self._clone_path(destination, _info.filename, paths)
+                    if _path is None:
+                        continue
+                    if _info.is_dir():
+                        os.makedirs(_path, exist_ok=True)
+                    elif stat.S_ISLNK(_info.external_attr >> 16):
+                        # symbolic links are stored with their target as content
+                        self._clone_symlink(
+                            destination, _path, zip_ref.read(_info).decode('utf-8'))
+                    else:
+                        with zip_ref.open(_info) as src:
+                            self._clone_file(src, _path, _info.external_attr >> 16)
+
+    @staticmethod
+    def _clone_path(destination: str, name: str, paths: list = None) -> str:
+        """Get the local path of an archive entry
+        :param destination: local destination directory
+        :param name: Entry name (prefixed by the archive top-level directory)
+        :param paths: Globs of the files to extract (None: all)
+        :returns: Local path (None if the entry must be skipped)"""
+        _relative = name.split('/', 1)[1].rstrip('/') if '/' in name else ''
+        if not _relative:
+            return None
+        if paths and not any(fnmatch.fnmatch(_relative, _glob) for _glob in paths):
+            return None
+        _path = os.path.abspath(os.path.join(destination, _relative))
+        if not _path.startswith(destination + os.sep):
+            # entries must not escape the destination
+            return None
+        return _path
+
+    @staticmethod
+    def _clone_file(src, path: str, mode: int):
+        """Write an archive entry
+        :param src: Entry file object
+        :param path: Local path
+        :param mode: Entry permissions (only the executable bits are kept)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fd:
+            shutil.copyfileobj(src, fd, 1024 * 1024)
+        if mode & stat.S_IXUSR:
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    @staticmethod
+    def _clone_symlink(destination: str, path: str, target: str):
+        """Create a symbolic link of an archive (skipped if it points out of the destination)
+        :param destination: local destination directory
+        :param path: Local path
+        :param target: Link target"""
+        _target = os.path.abspath(os.path.join(os.path.dirname(path), target))
+        if not _target.startswith(destination + os.sep):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        os.symlink(target, path)
+
+    def _tree(self, ref: str) -> tuple:
+        """Get the recursive git tree of a ref
+        (subtrees are read one by one if the recursive listing is truncated)
+        :param ref: Branch, tag or commit SHA
+        :returns: Tree SHA and blob entries (with their full path)"""
+        _tree = self._call_api(f"/git/trees/{ref}?recursive=1")
+        if not _tree['truncated']:
+            return _tree['sha'], [_entry for _entry in _tree['tree'] if _entry['type'] == 'blob']
+        _entries = []
+        _trees = deque([('', _tree['sha'])])
+        while _trees:
+            _prefix, _sha = _trees.popleft()
+            for _entry in self._call_api(f"/git/trees/{_sha}")['tree']:
+                _entry = {**_entry, 'path': f"{_prefix}{_entry['path']}"}
+                if _entry['type'] == 'tree':
+                    _trees.append((f"{_entry['path']}/", _entry['sha']))
+                elif _entry['type'] == 'blob':
+                    _entries.append(_entry)
+        return _tree['sha'], _entries
+
+    def _sync_blob(self, destination: str, entry: dict):
+        """Write a git blob to its local path
+        :param destination: local destination directory
+        :param entry: Tree entry"""
+        _path = os.path.join(destination, entry['path'])
+        _request = self._prepare_url(f"{self._endpoint}/git/blobs/{entry['sha']}")
+        _request['headers']['Accept'] = 'application/vnd.github.raw+json'
+        response = self._send('get', stream=True, **_request)
+        with response:
+            response.raise_for_status()
+            if os.path.isdir(_path) and not os.path.islink(_path):
+                # the path was a directory in the previous tree
+                shutil.rmtree(_path)
+            elif os.path.lexists(_path):
+                os.remove(_path)
+            if entry['mode'] == '120000':
+                # same confinement as clone: links leaving the destination are skipped
+                self._clone_symlink(destination, _path, response.content.decode('utf-8'))
+                return
+            response.raw.decode_content = True
+            self._clone_file(response.raw, _path, 0o755 if entry['mode'] == '100755' else 0o644)
+
+    def sync(self, destination: str = None, ref: str = None, paths: list = None,
+             max_workers: int = 8, manifest: str = '.github-sync.json') -> dict:
+        """Synchronize a local copy of the repository with a ref (incremental clone)
+
+        The recursive git tree is compared with the blob SHAs recorded in a manifest
+        by the previous sync: only the added or changed blobs are downloaded
+        (concurrently) and the files removed from the tree are deleted locally
+        :param destination: local destination directory
+        :param ref: remote branch, tag or commit
+        :param paths: Only synchronize the files matching one of these globs
+        :param max_workers: Number of blobs downloaded concurrently
+        :param manifest: Manifest file name (in the destination directory)
+        :returns: Paths added, updated and deleted"""
+        destination = os.path.abspath(destination or os.path.join(os.getcwd(), self.name))
+        ref = ref or self.default_branch
+        os.makedirs(destination, exist_ok=True)
+        manifest = os.path.join(destination, manifest)
+        _previous = self._read_manifest(manifest)
+        _result = {'added': [], 'updated': [], 'deleted': []}
+        _sha, _entries = self._tree(ref)
+        _files = {}
+        _changes = []
+        for _entry in _entries:
+            # tree paths have no archive top-level directory
+            if self._clone_path(destination, f"/{_entry['path']}", paths) is None:
+                continue
+            _files[_entry['path']] = {'sha': _entry['sha'], 'mode': _entry['mode']}
+            if _previous['files'].get(_entry['path']) == _files[_entry['path']] and \
+                    os.path.lexists(os.path.join(destination, _entry['path'])):
+                continue
+            _result['updated' if _entry['path'] in _previous['files'] else 'added'].append(
+                _entry['path'])
+            _changes.append(_entry)
+        # deletions first: a deleted file may be the parent directory of a new one
+        for _path in sorted(set(_previous['files']) - set(_files)):
+            self._sync_delete(destination, _path)
+            _result['deleted'].append(_path)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda _entry: self._sync_blob(destination, _entry), _changes))
+        self._write_manifest(manifest, {'tree': _sha, 'paths': paths, 'files': _files})
+        return _result
+
+    @staticmethod
+    def _read_manifest(path: str) -> dict:
+        """Read the manifest of the previous sync
+        :param path: Manifest file
+        :returns: Tree SHA, path filters and blob of each file (empty if never synchronized)"""
+        try:
+            with open(path, encoding='utf-8') as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return {'tree': None, 'paths': None, 'files': {}}
+
+    @staticmethod
+    def _write_manifest(path: str, manifest: dict):
+        """Write the manifest of a sync (atomically)
+        :param path: Manifest file
+        :param manifest: Tree SHA, path filters and blob of each file"""
+        _fd, _tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(_fd, 'w', encoding='utf-8') as fd:
+            json.dump(manifest, fd)
+        os.replace(_tmp, path)
+
+    @staticmethod
+    def _sync_delete(destination: str, path: str):
+        """Delete a file removed from the tree (and its empty parent directories)
+        :param destination: local destination directory
+        :param path: File path relative to the destination"""
+        _local = os.path.join(destination, path)
+        if os.path.lexists(_local):
+            os.remove(_local)
+        _parent = os.path.dirname(_local)
+        while _parent != destination and os.path.isdir(_parent) and not os.listdir(_parent):
+            os.rmdir(_parent)
+            _parent = os.path.dirname(_parent)
+
+    def list_runs(self, prefetch: int = 0, workflow: str = None, max_items: int = None,
+                  **kwargs) -> dict:
         """List repository action runs (generator to handle pagination)
+        :param prefetch: Number of pages fetched concurrently (0: one page at a time)
+        :param workflow: Only list the runs of this workflow (file name or ID)
+        :param max_items: Stop after this number of runs (most recent first)
+        :param kwargs: Filters (event, status, branch, created, head_sha...)
         :returns: run infos"""
-        _page = 1
-        _param = '&'.join([f'{k}={v}' for k, v in kwargs.items()])
-        while True:
-            _runs = self._call_api(
-                f"/actions/runs?per_page=100&page={_page}&{_param}")
-            if len(_runs['workflow_runs']) == 0:
-                break
-            yield from _runs['workflow_runs']
-            _page += 1
+        _resource = f"actions/workflows/{workflow}/runs" if workflow else "actions/runs"
+        yield from self._paginate(
+            _resource, kwargs, key='workflow_runs', max_items=max_items, prefetch=prefetch)
 
     def get_users(self) -> dict:
         """List users with access in a given repository"""
         return self._call_api("/collaborators")
 
+    def iter_users(self, per_page: int = 100, max_items: int = None):
+        """List all the users with access in a given repository (generator to handle pagination)
+        :param per_page: Page size (max 100)
+        :param max_items: Stop after this number of users
+        :returns: user dict"""
+        yield from self._paginate("collaborators", max_items=max_items, per_page=per_page)
+
     def delete_user(self, user: str) -> dict:
         """List users with access in a given repository"""
         return self._call_api(f"/collaborators/{user}", method="delete")
@@ -291,6 +1371,22 @@ class GitHubRepository(GitHubRequests):
         :returns: run info (JSON format)"""
         return self._call_api(f'/actions/runs/{run_id}')
 
+    def watch_runs(self, run_ids: list = (), callback=None, **kwargs) -> RunWatcher:
+        """Follow many workflow runs with a single polling loop
+        (a private conditional request cache is used if this object has none)
+        :param run_ids: Runs to track (more can be added with RunWatcher.watch)
+        :param callback: Function called with the run JSON on each status change
+        :param kwargs: RunWatcher arguments (min_interval, max_interval, age_factor...)
+        :returns: RunWatcher"""
+        _repository = self
+        if self.cache is None:
+            _repository = GitHubRepository(
+                self._token, self.name, **{**self._shared_options(), 'cache': MemoryCache(64)})
+        _watcher = RunWatcher(_repository, **kwargs)
+        for _run_id in run_ids:
+            _watcher.watch(_run_id, callback)
+        return _watcher
+
     def cancel_run(self, run_id: int):
         """Cancel a specific run
         :param run_id: ID of the run to cancel"""
@@ -298,22 +1394,24 @@ class GitHubRepository(GitHubRequests):
             f'/actions/runs/{run_id}/cancel',
             method='post')
 
-    def list_commits(self) -> dict:
+    def list_commits(self, prefetch: int = 0) -> dict:
         """List repository commits (generator to handle pagination)
+        :param prefetch: Number of pages fetched concurrently (0: one page at a time)
         :returns: commit infos"""
-        _page = 1
-        while True:
-            _commits = self._call_api(f"/commits?per_page=100&page={_page}")
-            if len(_commits) == 0:
-                break
-            yield from _commits
-            _page += 1
+        yield from self._paginate("commits", prefetch=prefetch)
 
     def get_deploy_keys(self) -> dict:
         """Get the deploy keys in a repository
         :returns: Keys (JSON format)"""
         return self._call_api("/keys")
 
+    def iter_deploy_keys(self, per_page: int = 100, max_items: int = None):
+        """Get all the deploy keys in a repository (generator to handle pagination)
+        :param per_page: Page size (max 100)
+        :param max_items: Stop after this number of keys
+        :returns: Key (JSON format)"""
+        yield from self._paginate("keys", max_items=max_items, per_page=per_page)
+
     def add_deploy_key(self, title: str, content: str,
                        write_access: bool = False) -> dict:
         """Add a new deploy key in a repository
@@ -329,19 +1427,57 @@ class GitHubRepository(GitHubRequests):
                 "read_only": (not write_access)},
             method="post")
 
+    def _secrets_key(self, stale_key_id: str = None) -> tuple:
+        """Get the public key encrypting the secrets (fetched once and cached)
+        :param stale_key_id: Key ID rejected by GitHub (fetched again if still cached)
+        :returns: Key ID and sealed box"""
+        with self._secrets_lock:
+            if self._public_key is None or self._public_key[0] == stale_key_id:
+                pkey = self._call_api("/actions/secrets/public-key")
+                self._public_key = (pkey['key_id'], nacl.public.SealedBox(nacl.public.PublicKey(
+                    pkey['key'].encode("utf-8"), nacl.encoding.Base64Encoder())))
+            return self._public_key
+
     def add_secret(self, name: str, value: str) -> dict:
         """Add Secret
         :param name: variable name to add
         :param value: secret value
         :returns: Secret in JSON format"""
-        pkey = self._call_api("/actions/secrets/public-key")
-        _encrypted = self._encrypt(pkey['key'], value)
-        self._call_api(
-            f"/actions/secrets/{name}",
-            {"encrypted_value": _encrypted, "key_id": pkey['key_id']},
-            "put")
+        _key_id, _box = self._secrets_key()
+        for _attempt in range(2):
+            _encrypted = base64.b64encode(_box.encrypt(value.encode("utf-8"))).decode("utf-8")
+            try:
+                self._call_api(
+                    f"/actions/secrets/{name}",
+                    {"encrypted_value": _encrypted, "key_id": _key_id},
+                    "put")
+                break
+            except requests.exceptions.HTTPError as err:
+                if _attempt or err.response is None or err.response.status_code != 422:
+                    raise
+                # the key may have been rotated since it was cached
+                _key_id, _box = self._secrets_key(stale_key_id=_key_id)
         return {"name": name, "encrypted_value": _encrypted}
 
+    def _add_secret_result(self, name: str, value: str):
+        """Add a secret, returning the error instead of raising it
+        :param name: variable name to add
+        :param value: secret value
+        :returns: Secret in JSON format (or the exception raised)"""
+        try:
+            return self.add_secret(name, value)
+        except requests.exceptions.RequestException as err:
+            return err
+
+    def add_secrets(self, secrets: dict, max_workers: int = 8) -> dict:
+        """Add many secrets concurrently (the public key is fetched once)
+        :param secrets: Dict of {name: value}
+        :param max_workers: Number of secrets sent concurrently
+        :returns: Secret in JSON format (or the exception raised) of each name"""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(secrets, executor.map(
+                lambda _name: self._add_secret_result(_name, secrets[_name]), secrets)))
+
     def get_commit(self, branch: str) -> dict:
         """Get the latest commit of a specific branch
         :param branch: branch name
@@ -361,18 +1497,12 @@ class GitHubRepository(GitHubRequests):
         return self._call_api(f"/pulls/{number}")
 
     def pull_request_approved(self, number: int) -> bool:
-        """Get a list of pull requests reviewers
-        :param branch: pull request number
-        :returns: pull request reviewers (JSON format)"""
-        _reviews = self._call_api(f"/pulls/{number}/reviews")
-        if not _reviews:
-            return False
-        for _review in _reviews:
-            if 'state' not in _review:
-                continue
-            if _review['state'] != 'APPROVED':
-                return False
-        return True
+        """Check the approval of a pull request (same rule as pull_requests_approved:
+        considering the latest review of each reviewer, someone approves it
+        and nobody requests changes)
+        :param number: pull request number
+        :returns: True if approved"""
+        return self._reviews_approved(list(self._paginate(f"pulls/{number}/reviews")))
 
     def browse(self, path: str) -> dict:
         """Browse the repository file structure on the default branch
@@ -381,55 +1511,131 @@ class GitHubRepository(GitHubRequests):
         path = path.replace(' ', '%20')
         return self._call_api(f"/contents/{path}")
 
-    def list_artifacts(self, run_id: int) -> str:
+    def list_artifacts(self, run_id: int, name: str = None, cached: bool = False) -> list:
         """List of the artifacts generated by a specific run
         :param run_id: Run ID
+        :param name: Only list the artifacts with this name
+        :param cached: Keep the artifacts of the run in memory and filter them locally
+                       on the next calls (for completed runs)
         :returns: JSON artifact details"""
-        artifacts = []
-        for artifact in self._call_api("/actions/artifacts")['artifacts']:
-            if artifact['workflow_run']['id'] == run_id:
-                artifacts.append(artifact)
-        return artifacts
+        if cached:
+            if run_id not in self._artifacts:
+                self._artifacts[run_id] = self.list_artifacts(run_id)
+            return [_artifact for _artifact in self._artifacts[run_id]
+                    if name is None or _artifact['name'] == name]
+        return list(self._paginate(
+            f"actions/runs/{run_id}/artifacts", {'name': name}, key='artifacts'))
+
+    def _dispatch(self, workflow: str, payload: dict) -> dict:
+        """Create a workflow dispatch event, asking GitHub for the run details
+        :param workflow: Remote workflow file name
+        :param payload: Parameters to send to the workflow
+        :returns: Run details (empty if not returned, None if the workflow cannot be dispatched)"""
+        _resource = f"/actions/workflows/{workflow}/dispatches"
+        try:
+            return self._call_api(_resource, data={**payload, 'return_run_details': True},
+                                  method='post')
+        except requests.exceptions.HTTPError as err:
+            if err.response.status_code != 422:
+                raise
+        # servers without run details support reject the unknown parameter
+        try:
+            return self._call_api(_resource, data=payload, method='post')
+        except requests.exceptions.HTTPError as err:
+            if err.response.status_code == 422:
+                return None
+            raise
 
-    def execute_workflow(self, workflow: str, payload: dict, head_sha: str = None) -> int:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def execute_workflow(self, workflow: str, payload: dict, head_sha: str = None,
+                         correlation_input: str = None, timeout: float = 300.0) -> int:
         """Execute a workflow dispatch run and return the run ID
+
+        The run ID is read from the dispatch response when GitHub returns the run
+        details. Otherwise the recent runs of the workflow are polled (with a growing
+        interval) until the run shows up: the run whose title holds the correlation
+        token if correlation_input is set, else the first run which was not listed
+        before the dispatch
         :param workflow: Remote workflow file name
         :param payload: Parameters to send to the workflow
         :param head_sha: current HEAD SHA of the branch where the workflow is executed
-        :returns: Run ID"""
+        :param correlation_input: Workflow input receiving a unique token
+                                  (the workflow run-name must contain this input)
+        :param timeout: Maximum time in seconds to wait for the run
+        :returns: Run ID (0 if the workflow cannot be dispatched)"""
         init_date = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
-        current_ids = []
-        new_ids = []
-        job_id = 0
         opts = {'event': 'workflow_dispatch', 'created': f'{init_date}..*'}
         if head_sha:
             opts['head_sha'] = head_sha
-        for run in self.list_runs(**opts):
-            current_ids += [run['id']]
-        current_ids.sort()
-        if self.debug:
-            print(f"current_ids: {current_ids}")
-        try:
-            self._call_api(f"/actions/workflows/{workflow}/dispatches",
-                           data=payload, method='post')
-        except requests.exceptions.HTTPError as err:
-            if err.response.status_code == 422:
-                return 0
-            raise
-        while job_id == 0:
-            time.sleep(2)
-            for run in self.list_runs(**opts):
-                new_ids += [run['id']]
-            new_ids.sort()
+        token = None
+        current_ids = set()
+        if correlation_input:
+            token = str(uuid.uuid4())
+            payload = {**payload, 'inputs': {**payload.get('inputs', {}), correlation_input: token}}
+        else:
+            current_ids = {run['id'] for run in self.list_runs(workflow=workflow, **opts)}
+            if self.debug:
+                print(f"current_ids: {sorted(current_ids)}")
+        details = self._dispatch(workflow, payload)
+        if details is None:
+            return 0
+        if details.get('workflow_run_id'):
+            return details['workflow_run_id']
+        deadline = time.monotonic() + timeout
+        interval = 1.0
+        while True:
+            new_ids = sorted(
+                run['id'] for run in self.list_runs(workflow=workflow, max_items=100, **opts)
+                if run['id'] not in current_ids
+                and (token is None or token in (run.get('display_title') or run.get('name') or '')))
             if self.debug:
                 print(f"new_ids: {new_ids}")
-                difference = [x for x in new_ids if x not in current_ids]
-                print(f"difference: {difference}")
-            for potential_id in [x for x in new_ids if x not in current_ids]:
-                if self.get_run(potential_id)['path'].split('/')[-1] == workflow:
-                    job_id = potential_id
-                    break
-        return job_id
+            if new_ids:
+                return new_ids[0]
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"no run of {workflow} found after {timeout}s")
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            interval = min(interval * 1.5, 10.0)
+
+    def _artifact_variables(self, url: str, workflow: str, prefix: str) -> str:
+        """Read the variables of an artifact (the zip is not extracted; it is streamed
+        to a temporary file kept in memory up to ARTIFACT_MEMORY_LIMIT bytes)
+        :param url: Remote artifact URL
+        :param workflow: variable name workflow
+        :param prefix: exported variable prefix
+        :returns: Variable lines"""
+        _request = self._prepare_url(url)
+        if self.debug:
+            print(f"call: {redact_request(_request)}")
+        response = self._send('get', stream=True, **_request)
+        with response, tempfile.SpooledTemporaryFile(max_size=ARTIFACT_MEMORY_LIMIT) as archive:
+            response.raise_for_status()
+            for _chunk in response.iter_content(chunk_size=1024 * 1024):
+                archive.write(_chunk)
+            archive.seek(0)
+            lines = self._zip_variables(archive, workflow, prefix)
+        return ''.join(lines)
+
+    @staticmethod
+    def _zip_variables(archive, workflow: str, prefix: str) -> list:
+        """Read the variables of an artifact zip
+        :param archive: Zip file object
+        :param workflow: variable name workflow
+        :param prefix: exported variable prefix
+        :returns: Variable lines"""
+        lines = []
+        with zipfile.ZipFile(archive, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+                with zip_ref.open(info) as fd:
+                    value = io.TextIOWrapper(fd, encoding='utf-8').readline().rstrip()
+                file = info.filename.split('/')[-1]
+                for var_prefix in (f"{prefix}_{workflow}", prefix):
+                    key = f"{var_prefix}_{file}".upper().replace(
+                        '.', '_').replace('/', '_').replace('-', '_')
+                    lines.append(f"{key}={value}\n")
+        return lines
 
     def export_variables(self, url: str, workflow: str, output: str, prefix: str = None):
         """Extract variables from artifacts and fill a file with the variables
@@ -438,53 +1644,130 @@ class GitHubRepository(GitHubRequests):
         :param output: Local file name where the variables are exported
         :param prefix: exported variable prefix"""
         prefix = prefix or self.name.split('/')[-1]
-        zip_file_name = f'{str(uuid.uuid4())}.zip'
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            self.download(url, os.path.join(tmpdirname, zip_file_name))
-            with zipfile.ZipFile(
-                    os.path.join(tmpdirname, zip_file_name), 'r') as zip_ref:
-                zip_ref.extractall(tmpdirname)
-            for tree_struct in os.walk(tmpdirname):
-                files = [file for file in tree_struct[2] if file != zip_file_name]
-                for file in files:
-                    value = ''
-                    with open(os.path.join(tree_struct[0], file), encoding='utf-8') as fd:
-                        value = fd.read().split('\n')[0].rstrip()
-                    with open(output, mode="a", encoding='utf-8') as fd:
-                        for var_prefix in (f"{prefix}_{workflow}", prefix):
-                            key = f"{var_prefix}_{file}".upper().replace(
-                                '.', '_').replace('/', '_').replace('-', '_')
-                            fd.write(f"{key}={value}\n")
+        variables = self._artifact_variables(url, workflow, prefix)
+        with open(output, mode="a", encoding='utf-8') as fd:
+            fd.write(variables)
+
+    def export_artifacts_variables(self, artifacts: list, output: str, prefix: str = None,
+                                   max_workers: int = 4):
+        """Extract variables from many artifacts concurrently into a new file
+        (the output file is replaced atomically once all the artifacts are read)
+        :param artifacts: List of (remote artifact URL, variable name workflow)
+        :param output: Local file name where the variables are exported
+        :param prefix: exported variable prefix
+        :param max_workers: Number of artifacts downloaded concurrently"""
+        prefix = prefix or self.name.split('/')[-1]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            variables = list(executor.map(
+                lambda _artifact: self._artifact_variables(*_artifact, prefix), artifacts))
+        _fd, _tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix='.tmp')
+        try:
+            with os.fdopen(_fd, 'w', encoding='utf-8') as fd:
+                fd.write(''.join(variables))
+            os.replace(_tmp, output)
+        except OSError:
+            if os.path.exists(_tmp):
+                os.remove(_tmp)
+            raise
+
+    @staticmethod
+    def _tree_entry(path: str, content, inline_limit: int) -> tuple:
+        """Build the tree entry of a changed file
+        :param path: File path
+        :param content: str (text), bytes (binary), None (deleted file)
+                        or dict with content and mode (e.g. 100755 for executables)
+        :param inline_limit: Maximum size in bytes of the text files inlined in the tree
+        :returns: Tree entry and content of the blob to create (None if not needed)"""
+        _mode = '100644'
+        if isinstance(content, dict):
+            _mode = content.get('mode', _mode)
+            content = content.get('content')
+        _entry = {'path': path, 'mode': _mode, 'type': 'blob'}
+        if content is None:
+            return {**_entry, 'sha': None}, None
+        if isinstance(content, str):
+            if len(content.encode('utf-8')) <= inline_limit:
+                return {**_entry, 'content': content}, None
+            content = content.encode('utf-8')
+        return _entry, content
 
+    @staticmethod
+    def _tree_chunks(entries: list, max_entries: int, max_bytes: int = 8 * 1024 * 1024):
+        """Split tree entries into payloads built one after the other (generator)
+        :param entries: Tree entries
+        :param max_entries: Maximum number of entries per payload
+        :param max_bytes: Maximum size of the inlined contents per payload
+        :returns: Tree entries"""
+        _chunk = []
+        _size = 0
+        for _entry in entries:
+            _length = len(_entry.get('content', ''))
+            if _chunk and (len(_chunk) >= max_entries or _size + _length > max_bytes):
+                yield _chunk
+                _chunk = []
+                _size = 0
+            _chunk.append(_entry)
+            _size += _length
+        yield _chunk
+
+    def _create_blob(self, content: bytes) -> str:
+        """Create a git blob
+        :param content: Blob content
+        :returns: Blob SHA"""
+        return self._call_api(
+            '/git/blobs',
+            method='post',
+            data={'content': base64.b64encode(content).decode(), 'encoding': 'base64'})['sha']
+
+    def _tree_payload(self, files: dict, inline_limit: int, max_workers: int) -> list:
+        """Build the tree entries of changed files, creating the blobs concurrently
+        :param files: Dict of {path: content}
+        :param inline_limit: Maximum size in bytes of the text files inlined in the tree
+        :param max_workers: Number of blobs created concurrently
+        :returns: Tree entries"""
+        _payload = []
+        _blobs = []
+        for _path, _content in files.items():
+            _entry, _blob = self._tree_entry(_path, _content, inline_limit)
+            _payload.append(_entry)
+            if _blob is not None:
+                _blobs.append((_entry, _blob))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for (_entry, _), _sha in zip(_blobs, executor.map(
+                    self._create_blob, [_blob for _, _blob in _blobs])):
+                _entry['sha'] = _sha
+        return _payload
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     def create_pull_request(self, branch: str, commit_message: str,
-                            files: dict, target_branch: str = None) -> str:
+                            files: dict, target_branch: str = None, max_workers: int = 8,
+                            inline_limit: int = 64 * 1024, max_tree_entries: int = 1000) -> str:
         """Create a pull request
+
+        Small text files are sent inline in the tree, the other blobs are created
+        concurrently. Large changesets are split in trees built on top of each other
         :param branch: Source branch
         :param commit_message: Commit message
-        :param files: Dict of {path: content}
+        :param files: Dict of {path: content}, the content being str (text), bytes (binary),
+                      None (deleted file) or a dict with content and mode (e.g. 100755)
         :param target_branch: Destination branch (default: default branch)
+        :param max_workers: Number of blobs created concurrently
+        :param inline_limit: Maximum size in bytes of the text files inlined in the tree
+        :param max_tree_entries: Maximum number of entries per tree request
         :returns: Pull Request URL"""
-        _payload = []
         target_branch = target_branch or self.default_branch
-        for _path, _content in files.items():
-            _b64_content = base64.b64encode(_content.encode('utf-8')).decode()
-            _sha = self._call_api(
-                '/git/blobs',
-                method='post',
-                data={'content': _b64_content, 'encoding': 'base64'})['sha']
-            _payload += [{
-                'path': _path, 'mode': '100644',
-                'type': 'blob', 'sha': _sha}]
-
+        _payload = self._tree_payload(files, inline_limit, max_workers)
         _target_sha = self._call_api(f"/git/trees/{target_branch}")['sha']
         _branch = self._call_api(
             "/git/refs",
             data={'ref': f"refs/heads/{branch}", "sha": _target_sha},
             method='post')
-        _tree_sha = self._call_api(
-            "/git/trees",
-            data={'tree': _payload, 'base_tree': _branch['object']['sha']},
-            method='post')['sha']
+        _tree_sha = _branch['object']['sha']
+        for _chunk in self._tree_chunks(_payload, max_tree_entries):
+            _tree_sha = self._call_api(
+                "/git/trees",
+                data={'tree': _chunk, 'base_tree': _tree_sha},
+                method='post')['sha']
         _commit_sha = self._call_api(
             "/git/commits",
             method='post',
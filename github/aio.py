@@ -0,0 +1,559 @@
+"""Asyncio interface to GitHub API (requires aiohttp)"""
+# pylint: disable=duplicate-code
+
+import time
+import asyncio
+import base64
+import urllib.parse
+import requests
+from . import GitHubRequests, RetryPolicy, MemoryCache, SearchQuota, SEARCH_LIMIT
+from .metrics import redact_request, redact_url, request_event
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+class AsyncGitHubSession:
+    """Connection pool shared between asyncio GitHub clients"""
+    def __init__(self, pool_size: int = 100, concurrency: int = 100,
+                 keep_alive: bool = True, hooks: list = None):
+        """Contructor
+        :param pool_size: Maximum number of open connections
+        :param concurrency: Maximum number of requests in flight
+        :param keep_alive: Keep connections open between requests
+        :param hooks: Functions called with the event of each request
+                      (e.g. PrometheusMetrics, LoggingMetrics)"""
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the asyncio client "
+                              "(pip install python-github[async])")
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._client = None
+        self.hooks = list(hooks or [])
+        # GitHub limits the code search separately (10 requests per minute)
+        self.search_quotas = {
+            'search': SearchQuota(),
+            'code_search': SearchQuota(limit=10, resource='code_search')}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _get_client(self):
+        """Get the aiohttp session (created in the running event loop)
+        :returns: aiohttp.ClientSession"""
+        if self._client is None or self._client.closed:
+            self._client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+                limit=self.pool_size, force_close=not self.keep_alive))
+        return self._client
+
+    async def request(self, method: str, **kwargs) -> requests.Response:
+        """Send a request through the connection pool
+        :param method: HTTP method
+        :param kwargs: requests-like arguments (url, headers, data, timeout)
+        :returns: Response (requests.Response so both clients share error handling)"""
+        _timeout = aiohttp.ClientTimeout(total=kwargs.pop('timeout', None))
+        async with self._semaphore:
+            async with self._get_client().request(
+                    method.upper(), timeout=_timeout, **kwargs) as _response:
+                _content = await _response.read()
+        response = requests.Response()
+        response.status_code = _response.status
+        response.reason = _response.reason
+        response.url = kwargs['url']
+        response.headers.update(_response.headers)
+        # pylint: disable=protected-access
+        response._content = _content
+        return response
+
+    def emit(self, event: dict):
+        """Report an event to the hooks
+        :param event: Request event"""
+        for _hook in self.hooks:
+            _hook(event)
+
+    async def close(self):
+        """Close all the pooled connections"""
+        if self._client is not None:
+            await self._client.close()
+
+
+# pylint: disable=too-many-instance-attributes
+class AsyncGitHubRequests:
+    """Parent class to execute GitHub API requests from an event loop"""
+    # helpers without I/O are shared with the blocking client
+    # pylint: disable=protected-access
+    _prepare_url = GitHubRequests._prepare_url
+    _encrypt = GitHubRequests._encrypt
+    _cache_key = GitHubRequests._cache_key
+    _conditional_request = GitHubRequests._conditional_request
+    _store_response = GitHubRequests._store_response
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, endpoint: str, debug: bool = False,
+                 session: AsyncGitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None):
+        """Contructor
+        :param token: GitHub token (gotten from the user Settings page)
+        :param endpoint: Resource endpoint
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls (MemoryCache or DiskCache)
+        :param retry: Retry policy (default: RetryPolicy())"""
+        self._token = token
+        self._endpoint = endpoint
+        self.debug = debug
+        self.session = session or AsyncGitHubSession()
+        self.cache = cache
+        self.retry = retry or RetryPolicy()
+        self._content = {}
+        self.timeout = 3
+
+    _identifier = staticmethod(GitHubRequests._identifier)
+    _reviews_approved = staticmethod(GitHubRequests._reviews_approved)
+
+    @classmethod
+    def from_json(cls, token: str, content: dict, debug: bool = False, **kwargs):
+        """Create an object from an already fetched resource (no request is sent)
+        :param token: GitHub token
+        :param content: Resource JSON (e.g. an item of a listing)
+        :param debug: Debug mode
+        :param kwargs: Other constructor arguments (session, cache, retry)
+        :returns: Object"""
+        _object = cls(token, cls._identifier(content), debug, **kwargs)
+        _object._content = dict(content)
+        return _object
+
+    def _shared_options(self) -> dict:
+        """Options passed to the objects created by this one
+        :returns: constructor keyword arguments"""
+        return {
+            'debug': self.debug, 'session': self.session,
+            'cache': self.cache, 'retry': self.retry}
+
+    async def _send(self, method: str, **kwargs) -> requests.Response:
+        """Send a request, retrying it according to the retry policy
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response"""
+        _attempt = 0
+        _start = time.monotonic() if self.session.hooks else 0
+        while True:
+            _attempt += 1
+            try:
+                response = await self.session.request(method, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                _error = requests.exceptions.ConnectionError(str(err))
+                if isinstance(err, asyncio.TimeoutError):
+                    _error = requests.exceptions.ReadTimeout(str(err))
+                _delay = self.retry.delay(method, _attempt, error=_error)
+                if _delay is None:
+                    if self.session.hooks:
+                        self.session.emit(request_event(
+                            method, kwargs, time.monotonic() - _start, _attempt, error=_error))
+                    raise _error from err
+            else:
+                _delay = self.retry.delay(method, _attempt, response=response)
+                if _delay is None:
+                    if self.session.hooks:
+                        self.session.emit(request_event(
+                            method, kwargs, time.monotonic() - _start, _attempt,
+                            response=response))
+                    return response
+            if self.debug:
+                print(f"retry #{_attempt} in {_delay:.1f}s: {method.upper()} "
+                      f"{redact_url(kwargs['url'])}")
+            await asyncio.sleep(_delay)
+
+    async def _fetch(self, method: str, **kwargs) -> tuple:
+        """Execute request and keep the Response (to read its headers)
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response JSON dict and Response"""
+        _cache_key = None
+        _cached = None
+        if self.cache is not None and method == 'get':
+            kwargs['headers'] = dict(kwargs['headers'])
+            _cache_key, _cached = self._conditional_request(kwargs['url'], kwargs['headers'])
+        if self.debug:
+            print(f"call: {redact_request(kwargs)}")
+        response = await self._send(method, **kwargs)
+        # pylint: disable=no-member
+        if _cached and response.status_code == requests.codes.not_modified:
+            if _cached.get('link') and 'Link' not in response.headers:
+                response.headers['Link'] = _cached['link']
+            return _cached['body'], response
+        response.raise_for_status()
+        if response.status_code == requests.codes.no_content:
+            _return_value = {}
+        else:
+            _return_value = response.json()
+        if _cache_key is not None and response.status_code == requests.codes.ok:
+            self._store_response(_cache_key, response, _return_value)
+        if self.debug:
+            print(f"response: {_return_value}")
+        return _return_value, response
+
+    async def _execute_request(self, method: str, **kwargs) -> dict:
+        """Execute request and format Response
+        :param method: HTTP method
+        :param kwargs: requests arguments
+        :returns: Response JSON dict"""
+        return (await self._fetch(method, **kwargs))[0]
+
+    async def _paginate(self, resource: str, params: dict = None, key: str = None,
+                        max_items: int = None, per_page: int = 100, endpoint: str = None):
+        """Iterate over the items of a paginated listing (async generator)
+
+        Pages are followed through their 'next' Link so no empty page is requested
+        :param resource: Resource to list (prefixed by the class endpoint)
+        :param params: Query parameters (None values are skipped)
+        :param key: Key holding the items in wrapped responses (workflow_runs, artifacts...)
+        :param max_items: Stop after this number of items
+        :param per_page: Page size (max 100)
+        :param endpoint: Endpoint prefix (default: the class endpoint)
+        :returns: items"""
+        _params = {'per_page': per_page}
+        _params.update({_k: _v for _k, _v in (params or {}).items() if _v is not None})
+        _endpoint = self._endpoint if endpoint is None else endpoint
+        _url = f"{_endpoint}/{resource}" if _endpoint else resource
+        _url += f"?{urllib.parse.urlencode(_params)}"
+        _count = 0
+        while _url:
+            _page, _response = await self._fetch('get', **self._prepare_url(_url))
+            for _item in (_page[key] if key else _page):
+                if max_items is not None and _count >= max_items:
+                    return
+                yield _item
+                _count += 1
+            _url = _response.links.get('next', {}).get('url')
+            if max_items is not None and _count >= max_items:
+                return
+
+    async def _search_api(self, endpoint: str, query: dict) -> dict:
+        """Request GitHub Search API (protected)
+        :param endpoint: Resource to search for
+        :param query: Query dictionary
+        :returns: GitHub API JSON Response"""
+        _str_query = ' '.join([f"{k}:{v}" if k else v for k, v in query.items()])
+        _next = f"search/{endpoint}?{urllib.parse.urlencode({'per_page': 100, 'q': _str_query})}"
+        _quota = self.session.search_quotas['code_search' if endpoint == 'code' else 'search']
+        _results = []
+        while _next:
+            await _quota.aacquire()
+            _page, _response = await self._fetch('get', **self._prepare_url(_next))
+            _quota.update(_response)
+            _results += _page['items']
+            if len(_results) >= min(_page.get('total_count', SEARCH_LIMIT), SEARCH_LIMIT):
+                break
+            _next = _response.links.get('next', {}).get('url')
+        return _results
+
+    async def _call_api(self, resource: str = None, data: dict = None,
+                        method: str = 'get') -> dict:
+        """Request GitHub API (protected)
+        :param resource: Resource to reach (prefixed by the class endpoint)
+        :param data: Request body (if needed)
+        :param method: Request method
+        :returns: GitHub API JSON Response"""
+        _endpoint = self._endpoint
+        if resource:
+            _endpoint += f"/{resource}"
+        _request = self._prepare_url(_endpoint, data)
+        return await self._execute_request(method.lower(), **_request)
+
+    async def fetch(self, refresh: bool = False) -> dict:
+        """Get the resource itself (the blocking client loads it on attribute access)
+        :param refresh: Request it again even if already known
+        :returns: GitHub API JSON Response"""
+        if refresh or not self._content:
+            self._content = await self._call_api()
+        return self._content
+
+    async def add_variable(self, name: str, value: str):
+        """Add variable
+        :param name: variable name to add
+        :param value: variable value"""
+        await self._call_api(
+            "/actions/variables",
+            {'name': name, 'value': value},
+            "post")
+
+    async def delete_variable(self, name: str):
+        """Delete variable
+        :param name: variable to delete"""
+        await self._call_api(
+            f"/actions/variables/{name}",
+            method="delete")
+
+    async def list_variables(self) -> dict:
+        """List variables
+        :returns: variable dict"""
+        return (await self._call_api("/actions/variables"))['variables']
+
+    async def list_secrets(self) -> dict:
+        """List secrets
+        :returns: secret dict"""
+        return (await self._call_api("/actions/secrets"))['secrets']
+
+    async def delete_runner(self, runner_id: int):
+        """Delete runner
+        :param runner_id: runner to delete"""
+        await self._call_api(
+            f"/actions/runners/{runner_id}",
+            method="delete")
+
+    async def list_runners(self) -> dict:
+        """List runners
+        :returns: runner dict"""
+        return (await self._call_api("/actions/runners"))['runners']
+
+    async def get_issues(self) -> dict:
+        """List issues
+        :returns: issues dict"""
+        return await self._call_api("/issues")
+
+
+class AsyncGitHubOrganization(AsyncGitHubRequests):
+    """Class to manage Organizations via GitHub API from an event loop"""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, organization: str, debug: bool = False,
+                 session: AsyncGitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None):
+        """Contructor
+        :param token: GitHub token (needs the admin:org rights)
+        :param organization: Organization name
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls
+        :param retry: Retry policy (default: RetryPolicy())"""
+        super().__init__(token, f"orgs/{organization}", debug, session, cache, retry)
+        self.name = organization
+
+    @staticmethod
+    def _identifier(content: dict) -> str:
+        """Get the organization name from its JSON
+        :param content: Organization JSON
+        :returns: Organization name"""
+        return content['login']
+
+    async def list_repositories(self):
+        """List organization repositories (async generator to handle pagination)
+        :returns: repository infos"""
+        async for _repo in self._paginate("repos"):
+            yield AsyncGitHubRepository.from_json(
+                self._token, _repo, **self._shared_options())
+
+    async def get_pull_requests(self, state: str, author: str = None) -> dict:
+        """Get pull requests at organization level
+        :param state: Status (open, closed)
+        :param author: Author (GitHub login)
+        :returns: GitHub API JSON Response"""
+        _query = {'state': state, 'type': 'pr', 'org': self.name}
+        if author:
+            _query['author'] = author
+        _results = await self._search_api("issues", _query)
+        return [_result for _result in _results if _result['locked'] is False]
+
+    async def find(self, pattern: str, path: str = None) -> dict:
+        """Search code at organization level
+        :param pattern: Pattern to search for
+        :param path: Path or file name to search in
+        :returns: GitHub API JSON Response"""
+        _query = {'': pattern, 'org': self.name, 'in': 'file'}
+        if path:
+            if '/' in path:
+                _query['path'] = path
+            else:
+                _query['filename'] = path
+        return await self._search_api("code", _query)
+
+
+# pylint: disable=too-many-public-methods
+class AsyncGitHubRepository(AsyncGitHubRequests):
+    """Class to manage Repositories via GitHub API from an event loop
+
+    File transfers (clone, download, export_variables) are only available
+    on the blocking GitHubRepository"""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, token: str, repository: str, debug: bool = False,
+                 session: AsyncGitHubSession = None, cache: MemoryCache = None,
+                 retry: RetryPolicy = None):
+        """Contructor
+        :param token: GitHub token (needs the repo rights)
+        :param repository: repository name
+        :param debug: Debug mode
+        :param session: Connection pool (a new one is created if not set)
+        :param cache: Conditional request cache for GET calls
+        :param retry: Retry policy (default: RetryPolicy())"""
+        super().__init__(token, f"repos/{repository}", debug, session, cache, retry)
+        self.name = repository
+
+    @staticmethod
+    def _identifier(content: dict) -> str:
+        """Get the repository full name from its JSON
+        :param content: Repository JSON
+        :returns: Repository full name"""
+        return content['full_name']
+
+    async def list_runs(self, **kwargs):
+        """List repository action runs (async generator to handle pagination)
+        :param kwargs: Filters (event, status, branch, created, head_sha...)
+        :returns: run infos"""
+        async for _run in self._paginate("actions/runs", kwargs, key='workflow_runs'):
+            yield _run
+
+    async def get_users(self) -> dict:
+        """List users with access in a given repository"""
+        return await self._call_api("/collaborators")
+
+    async def delete_user(self, user: str) -> dict:
+        """Remove a user from a given repository"""
+        return await self._call_api(f"/collaborators/{user}", method="delete")
+
+    async def get_run(self, run_id: int) -> dict:
+        """Get a specific repository action run
+        :param run_id: Run ID
+        :returns: run info (JSON format)"""
+        return await self._call_api(f'/actions/runs/{run_id}')
+
+    async def cancel_run(self, run_id: int):
+        """Cancel a specific run
+        :param run_id: ID of the run to cancel"""
+        await self._call_api(
+            f'/actions/runs/{run_id}/cancel',
+            method='post')
+
+    async def list_commits(self):
+        """List repository commits (async generator to handle pagination)
+        :returns: commit infos"""
+        async for _commit in self._paginate("commits"):
+            yield _commit
+
+    async def get_deploy_keys(self) -> dict:
+        """Get the deploy keys in a repository
+        :returns: Keys (JSON format)"""
+        return await self._call_api("/keys")
+
+    async def add_deploy_key(self, title: str, content: str,
+                             write_access: bool = False) -> dict:
+        """Add a new deploy key in a repository
+        :param title: Title
+        :param content: Key content
+        :param write_access: Allow write access
+        :returns: Response (JSON format)"""
+        return await self._call_api(
+            "/keys",
+            data={
+                "title": title,
+                "key": content,
+                "read_only": (not write_access)},
+            method="post")
+
+    async def add_secret(self, name: str, value: str) -> dict:
+        """Add Secret
+        :param name: variable name to add
+        :param value: secret value
+        :returns: Secret in JSON format"""
+        pkey = await self._call_api("/actions/secrets/public-key")
+        _encrypted = self._encrypt(pkey['key'], value)
+        await self._call_api(
+            f"/actions/secrets/{name}",
+            {"encrypted_value": _encrypted, "key_id": pkey['key_id']},
+            "put")
+        return {"name": name, "encrypted_value": _encrypted}
+
+    async def get_commit(self, branch: str) -> dict:
+        """Get the latest commit of a specific branch
+        :param branch: branch name
+        :returns: commit info (JSON format)"""
+        return await self._call_api(f"/commits/{branch}")
+
+    async def close_pull_request(self, number: int) -> dict:
+        """Close a specific pull request
+        :param number: pull request number
+        :returns: pull request info (JSON format)"""
+        return await self._call_api(f"/pulls/{number}", {'state': 'closed'}, 'patch')
+
+    async def get_pull_request(self, number: int) -> dict:
+        """Get a specific pull request info
+        :param number: pull request number
+        :returns: pull request info (JSON format)"""
+        return await self._call_api(f"/pulls/{number}")
+
+    async def pull_request_approved(self, number: int) -> bool:
+        """Check the approval of a pull request (latest review of each reviewer)
+        :param number: pull request number
+        :returns: True if approved"""
+        return self._reviews_approved(
+            [_review async for _review in self._paginate(f"pulls/{number}/reviews")])
+
+    async def browse(self, path: str) -> dict:
+        """Browse the repository file structure on the default branch
+        :param path: Path to browse
+        :returns: JSON file structure"""
+        path = path.replace(' ', '%20')
+        return await self._call_api(f"/contents/{path}")
+
+    async def list_artifacts(self, run_id: int, name: str = None) -> list:
+        """List of the artifacts generated by a specific run
+        :param run_id: Run ID
+        :param name: Only list the artifacts with this name
+        :returns: JSON artifact details"""
+        return [_artifact async for _artifact in self._paginate(
+            f"actions/runs/{run_id}/artifacts", {'name': name}, key='artifacts')]
+
+    async def create_pull_request(self, branch: str, commit_message: str,
+                                  files: dict, target_branch: str = None) -> str:
+        """Create a pull request (blobs are created concurrently)
+        :param branch: Source branch
+        :param commit_message: Commit message
+        :param files: Dict of {path: content}
+        :param target_branch: Destination branch (default: default branch)
+        :returns: Pull Request URL"""
+        target_branch = target_branch or (await self.fetch())['default_branch']
+        _blobs = await asyncio.gather(*[
+            self._call_api(
+                '/git/blobs',
+                method='post',
+                data={
+                    'content': base64.b64encode(_content.encode('utf-8')).decode(),
+                    'encoding': 'base64'})
+            for _content in files.values()])
+        _payload = [{
+            'path': _path, 'mode': '100644',
+            'type': 'blob', 'sha': _blob['sha']} for _path, _blob in zip(files, _blobs)]
+        _target_sha = (await self._call_api(f"/git/trees/{target_branch}"))['sha']
+        _branch = await self._call_api(
+            "/git/refs",
+            data={'ref': f"refs/heads/{branch}", "sha": _target_sha},
+            method='post')
+        _tree_sha = (await self._call_api(
+            "/git/trees",
+            data={'tree': _payload, 'base_tree': _branch['object']['sha']},
+            method='post'))['sha']
+        _commit_sha = (await self._call_api(
+            "/git/commits",
+            method='post',
+            data={
+                'tree': _tree_sha,
+                'message': commit_message,
+                'parents': [_branch['object']['sha']]}))['sha']
+        await self._call_api(
+            f"/git/refs/heads/{branch}",
+            method='patch',
+            data={'sha': _commit_sha})
+        _pr = await self._call_api(
+            "/pulls",
+            method='post',
+            data={
+                'title': commit_message,
+                'body': commit_message,
+                'head': branch,
+                'base': target_branch})
+        return _pr['html_url']
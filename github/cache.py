@@ -0,0 +1,111 @@
+"""Response caches used for GitHub conditional requests"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """In-memory LRU cache of API responses"""
+    def __init__(self, maxsize: int = 1024):
+        """Contructor
+        :param maxsize: Maximum number of cached responses"""
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> dict:
+        """Get a cached response
+        :param key: Cache key
+        :returns: Cached entry (or None)"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, entry: dict):
+        """Store a response
+        :param key: Cache key
+        :param entry: Entry to cache (validators and body)"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        """Remove a cached response
+        :param key: Cache key"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all the cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    """On-disk cache of API responses (one JSON file per entry)
+
+    The directory can be shared between processes (e.g. CI jobs)"""
+    def __init__(self, directory: str):
+        """Contructor
+        :param directory: Cache directory (created if needed)"""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        """Get the file storing an entry
+        :param key: Cache key
+        :returns: File path"""
+        return os.path.join(
+            self.directory, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, key: str) -> dict:
+        """Get a cached response
+        :param key: Cache key
+        :returns: Cached entry (or None)"""
+        try:
+            with open(self._path(key), encoding='utf-8') as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, entry: dict):
+        """Store a response (atomically, so concurrent readers never see partial files)
+        :param key: Cache key
+        :param entry: Entry to cache (validators and body)"""
+        _fd, _tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(_fd, 'w', encoding='utf-8') as fd:
+                json.dump(entry, fd)
+            os.replace(_tmp, self._path(key))
+        except OSError:
+            if os.path.exists(_tmp):
+                os.remove(_tmp)
+
+    def delete(self, key: str):
+        """Remove a cached response
+        :param key: Cache key"""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all the cached responses"""
+        for _file in os.listdir(self.directory):
+            if not _file.endswith('.json'):
+                continue
+            try:
+                os.remove(os.path.join(self.directory, _file))
+            except OSError:
+                pass
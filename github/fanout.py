@@ -0,0 +1,71 @@
+"""Apply a function to many repositories on a bounded thread pool"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# pylint: disable=too-many-instance-attributes
+class FanOut:
+    """Run a function for each repository and yield the results as they finish
+
+    Repositories are consumed lazily (at most twice the number of workers are
+    queued), every task waits for the shared rate budget before starting, and
+    the errors are collected instead of stopping the other tasks"""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, func, repositories, budget, max_workers: int = 8, reserve: int = 0,
+                 progress=None):
+        """Contructor
+        :param func: Function called with each repository
+        :param repositories: Iterable of GitHubRepository
+        :param budget: RateBudget shared by the repositories clients
+        :param max_workers: Number of repositories processed concurrently
+        :param reserve: Number of API requests kept when the shared quota runs low
+        :param progress: Function called with this object after each repository"""
+        self.func = func
+        self.repositories = repositories
+        self.budget = budget
+        self.max_workers = max_workers
+        self.reserve = reserve
+        self.progress = progress
+        self.submitted = 0
+        self.completed = 0
+        self.errors = {}
+
+    def _call(self, repository):
+        """Process a repository once the rate budget allows it
+        :param repository: GitHubRepository
+        :returns: Function result"""
+        self.budget.wait(self.reserve)
+        return self.func(repository)
+
+    def __iter__(self):
+        """Process the repositories (generator)
+        :returns: Repository and function result of each successful repository"""
+        _repositories = iter(self.repositories)
+        _pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while True:
+                    for _repository in _repositories:
+                        _pending[executor.submit(self._call, _repository)] = _repository
+                        self.submitted += 1
+                        if len(_pending) >= self.max_workers * 2:
+                            break
+                    if not _pending:
+                        return
+                    for _future in wait(_pending, return_when=FIRST_COMPLETED).done:
+                        _repository = _pending.pop(_future)
+                        self.completed += 1
+                        if _future.exception() is not None:
+                            self.errors[_repository.name] = _future.exception()
+                        if self.progress:
+                            self.progress(self)
+                        if _future.exception() is None:
+                            yield _repository, _future.result()
+            finally:
+                for _future in _pending:
+                    _future.cancel()
+
+    def run(self) -> dict:
+        """Process all the repositories
+        :returns: Function result of each successful repository name"""
+        return {_repository.name: _result for _repository, _result in self}
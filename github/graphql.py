@@ -0,0 +1,261 @@
+"""Batched reads through GitHub GraphQL API
+
+Many repository / pull request reads are packed into aliased queries and
+the results are converted to the JSON returned by the REST API"""
+
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+REPOSITORY_FIELDS = """
+    id databaseId name nameWithOwner description url homepageUrl
+    isPrivate isArchived isFork isDisabled visibility
+    createdAt updatedAt pushedAt stargazerCount forkCount
+    owner { login } defaultBranchRef { name } primaryLanguage { name }"""
+
+PULL_REQUEST_FIELDS = """
+    id databaseId number title body state locked isDraft url merged mergeable
+    createdAt updatedAt closedAt mergedAt author { login }
+    headRefName headRefOid baseRefName baseRefOid"""
+
+REVIEW_FIELDS = "id databaseId state submittedAt author { login }"
+
+# Errors meaning the query is too expensive and must be split
+LIMIT_ERRORS = ('MAX_NODE_LIMIT_EXCEEDED', 'RESOURCE_LIMITS_EXCEEDED')
+
+
+class GraphQLError(Exception):
+    """Error returned by GitHub GraphQL API"""
+    def __init__(self, errors: list):
+        """Contructor
+        :param errors: 'errors' list of the GraphQL response"""
+        super().__init__('; '.join(_error.get('message', '') for _error in errors))
+        self.errors = errors
+
+
+def repository_json(node: dict) -> dict:
+    """Convert a GraphQL repository to its REST representation
+    :param node: GraphQL repository
+    :returns: REST repository JSON"""
+    return {
+        'id': node['databaseId'],
+        'node_id': node['id'],
+        'name': node['name'],
+        'full_name': node['nameWithOwner'],
+        'owner': {'login': node['owner']['login']},
+        'description': node['description'],
+        'html_url': node['url'],
+        'homepage': node['homepageUrl'],
+        'private': node['isPrivate'],
+        'archived': node['isArchived'],
+        'fork': node['isFork'],
+        'disabled': node['isDisabled'],
+        'visibility': node['visibility'].lower(),
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'pushed_at': node['pushedAt'],
+        'stargazers_count': node['stargazerCount'],
+        'forks_count': node['forkCount'],
+        'language': (node['primaryLanguage'] or {}).get('name'),
+        'default_branch': (node['defaultBranchRef'] or {}).get('name')}
+
+
+def pull_request_json(node: dict) -> dict:
+    """Convert a GraphQL pull request to its REST representation
+    :param node: GraphQL pull request
+    :returns: REST pull request JSON"""
+    return {
+        'id': node['databaseId'],
+        'node_id': node['id'],
+        'number': node['number'],
+        'title': node['title'],
+        'body': node['body'],
+        'state': 'open' if node['state'] == 'OPEN' else 'closed',
+        'locked': node['locked'],
+        'draft': node['isDraft'],
+        'html_url': node['url'],
+        'merged': node['merged'],
+        'mergeable': {'MERGEABLE': True, 'CONFLICTING': False}.get(node['mergeable']),
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'closed_at': node['closedAt'],
+        'merged_at': node['mergedAt'],
+        'user': {'login': (node['author'] or {}).get('login')},
+        'head': {'ref': node['headRefName'], 'sha': node['headRefOid']},
+        'base': {'ref': node['baseRefName'], 'sha': node['baseRefOid']}}
+
+
+def review_json(node: dict) -> dict:
+    """Convert a GraphQL pull request review to its REST representation
+    :param node: GraphQL review
+    :returns: REST review JSON"""
+    return {
+        'id': node['databaseId'],
+        'node_id': node['id'],
+        'state': node['state'],
+        'submitted_at': node['submittedAt'],
+        'user': {'login': (node['author'] or {}).get('login')}}
+
+
+class GraphQLBatch:
+    """Collect resource reads and execute them as a few aliased GraphQL queries"""
+    def __init__(self, client, max_aliases: int = 100, max_nodes: int = 5000,
+                 per_page: int = 100):
+        """Contructor
+        :param client: GitHubRequests object used to send the queries
+        :param max_aliases: Maximum number of reads per query
+        :param max_nodes: Node budget per query (a review page costs per_page nodes)
+        :param per_page: Reviews fetched per page"""
+        self._client = client
+        self.max_aliases = max_aliases
+        self.max_nodes = max_nodes
+        self.per_page = per_page
+        self._reads = {}
+
+    def __len__(self):
+        return len(self._reads)
+
+    def _add(self, key: str, kind: str, repository: str, number: int = None) -> str:
+        """Register a read
+        :param key: Result key
+        :param kind: Read type (repository, pull_request, reviews)
+        :param repository: Repository full name
+        :param number: Pull request number
+        :returns: Result key"""
+        _owner, _name = repository.split('/', 1)
+        self._reads[key] = {
+            'kind': kind, 'owner': _owner, 'name': _name,
+            'number': number, 'after': None}
+        return key
+
+    def repository(self, repository: str) -> str:
+        """Read a repository
+        :param repository: Repository full name
+        :returns: Result key"""
+        return self._add(repository, 'repository', repository)
+
+    def pull_request(self, repository: str, number: int) -> str:
+        """Read a pull request
+        :param repository: Repository full name
+        :param number: Pull request number
+        :returns: Result key"""
+        return self._add(f"{repository}#{number}", 'pull_request', repository, number)
+
+    def reviews(self, repository: str, number: int) -> str:
+        """Read all the reviews of a pull request
+        :param repository: Repository full name
+        :param number: Pull request number
+        :returns: Result key"""
+        return self._add(f"{repository}#{number}/reviews", 'reviews', repository, number)
+
+    def _cost(self, read: dict) -> int:
+        """Estimate the number of nodes of a read
+        :param read: Read
+        :returns: Node count"""
+        return self.per_page + 1 if read['kind'] == 'reviews' else 1
+
+    def _query(self, batch: list) -> tuple:
+        """Build an aliased query
+        :param batch: List of (key, read)
+        :returns: Query and variables"""
+        _declarations = []
+        _fields = []
+        _variables = {}
+        for _index, (_, _read) in enumerate(batch):
+            _declarations += [f"$o{_index}: String!", f"$n{_index}: String!"]
+            _variables.update({f"o{_index}": _read['owner'], f"n{_index}": _read['name']})
+            if _read['kind'] == 'repository':
+                _body = REPOSITORY_FIELDS
+            else:
+                _declarations.append(f"$p{_index}: Int!")
+                _variables[f"p{_index}"] = _read['number']
+                _body = PULL_REQUEST_FIELDS
+                if _read['kind'] == 'reviews':
+                    _declarations.append(f"$c{_index}: String")
+                    _variables[f"c{_index}"] = _read['after']
+                    _body = (f"reviews(first: {self.per_page}, after: $c{_index}) "
+                             f"{{ nodes {{ {REVIEW_FIELDS} }} "
+                             "pageInfo { hasNextPage endCursor } }")
+                _body = f"pullRequest(number: $p{_index}) {{ {_body} }}"
+            _fields.append(
+                f"q{_index}: repository(owner: $o{_index}, name: $n{_index}) {{ {_body} }}")
+        return f"query({', '.join(_declarations)}) {{ {' '.join(_fields)} }}", _variables
+
+    def _run(self, batch: list) -> dict:
+        """Execute a batch, splitting it while GitHub rejects it as too expensive
+        :param batch: List of (key, read)
+        :returns: GraphQL node of each key"""
+        _query, _variables = self._query(batch)
+        try:
+            _response = self._client.graphql(_query, _variables)
+        except requests.exceptions.HTTPError as err:
+            # very large queries time out instead of being rejected
+            if len(batch) == 1 or err.response is None \
+                    or err.response.status_code not in (502, 504):
+                raise
+            _response = {'errors': [{'type': 'RESOURCE_LIMITS_EXCEEDED'}]}
+        _errors = _response.get('errors') or []
+        if any(_error.get('type') in LIMIT_ERRORS for _error in _errors) and len(batch) > 1:
+            _half = len(batch) // 2
+            return {**self._run(batch[:_half]), **self._run(batch[_half:])}
+        _fatal = [_error for _error in _errors if _error.get('type') != 'NOT_FOUND']
+        if _fatal:
+            raise GraphQLError(_fatal)
+        _data = _response.get('data') or {}
+        return {_key: _data.get(f"q{_index}") for _index, (_key, _) in enumerate(batch)}
+
+    def _batches(self, reads: list):
+        """Split reads according to the alias and node budgets (generator)
+        :param reads: List of (key, read)
+        :returns: List of (key, read)"""
+        _batch = []
+        _nodes = 0
+        for _key, _read in reads:
+            _cost = self._cost(_read)
+            if _batch and (len(_batch) >= self.max_aliases or _nodes + _cost > self.max_nodes):
+                yield _batch
+                _batch = []
+                _nodes = 0
+            _batch.append((_key, _read))
+            _nodes += _cost
+        if _batch:
+            yield _batch
+
+    def _store(self, results: dict, key: str, node: dict) -> bool:
+        """Convert a GraphQL node and store it in the results
+        :param results: Results (updated)
+        :param key: Result key
+        :param node: GraphQL node of the aliased repository
+        :returns: True if the read has more pages"""
+        _read = self._reads[key]
+        if _read['kind'] == 'repository':
+            results[key] = repository_json(node) if node else None
+            return False
+        node = (node or {}).get('pullRequest')
+        if _read['kind'] == 'pull_request':
+            results[key] = pull_request_json(node) if node else None
+            return False
+        node = (node or {}).get('reviews')
+        if node is None:
+            results[key] = None
+            return False
+        results.setdefault(key, [])
+        results[key] += [review_json(_review) for _review in node['nodes']]
+        _read['after'] = node['pageInfo']['endCursor']
+        return node['pageInfo']['hasNextPage']
+
+    def execute(self, max_workers: int = 1) -> dict:
+        """Execute all the registered reads
+        :param max_workers: Number of queries sent concurrently
+        :returns: REST JSON of each result key (None if not found)"""
+        _results = {}
+        _pending = list(self._reads.items())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while _pending:
+                _next = []
+                for _nodes in executor.map(self._run, self._batches(_pending)):
+                    for _key, _node in _nodes.items():
+                        if self._store(_results, _key, _node):
+                            _next.append((_key, self._reads[_key]))
+                _pending = _next
+        self._reads.clear()
+        return _results
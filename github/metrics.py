@@ -0,0 +1,260 @@
+"""Instrumentation of the GitHub API requests
+
+The clients report one event per request (and per download) to the hooks of
+their session, which are callables taking the event dict. PrometheusMetrics
+aggregates the events per endpoint template and LoggingMetrics writes them as
+structured log records. Credentials never reach the hooks"""
+
+import json
+import logging
+import threading
+import urllib.parse
+
+# Latency histogram buckets in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Headers and query parameters masked before being reported
+SENSITIVE_HEADERS = frozenset(('authorization', 'cookie', 'proxy-authorization'))
+SENSITIVE_PARAMS = frozenset((
+    'token', 'jwt', 'sig', 'signature', 'x-amz-signature', 'x-amz-credential',
+    'x-amz-security-token'))
+REDACTED = '***'
+
+# Path segments followed by names (replaced by placeholders in the templates)
+_NAMES = {
+    'repos': ('{owner}', '{repo}'), 'orgs': ('{org}',), 'users': ('{user}',),
+    'variables': ('{name}',), 'secrets': ('{name}',), 'environments': ('{name}',),
+    'branches': ('{branch}',), 'workflows': ('{workflow}',), 'collaborators': ('{user}',),
+    'commits': ('{ref}',)}
+# Sub-resources which are not names (e.g. actions/secrets/public-key)
+_LITERALS = frozenset(('public-key',))
+# Path segments followed by a path or a ref which can contain slashes
+_PATHS = {
+    'contents': '{path}', 'refs': '{ref}', 'tarball': '{ref}', 'zipball': '{ref}',
+    'trees': '{ref}'}
+
+
+def _is_sha(segment: str) -> bool:
+    """Check if a path segment is a commit / object SHA
+    :param segment: Path segment
+    :returns: True if 40 hexadecimal characters"""
+    return len(segment) == 40 and all(_char in '0123456789abcdef' for _char in segment)
+
+
+def endpoint_template(url: str) -> str:
+    """Get the endpoint of a URL without its identifiers
+    (e.g. /repos/{owner}/{repo}/actions/runs/{id})
+    :param url: Request URL
+    :returns: Endpoint template (the host for URLs outside the API)"""
+    _url = urllib.parse.urlsplit(url)
+    if _url.netloc != 'api.github.com':
+        return _url.netloc
+    _segments = [_segment for _segment in _url.path.split('/') if _segment]
+    _template = []
+    _placeholders = ()
+    for _index, _segment in enumerate(_segments):
+        if _placeholders and _segment in _LITERALS:
+            _template.append(_segment)
+            _placeholders = ()
+        elif _placeholders:
+            _template.append(
+                '{sha}' if _placeholders[0] == '{ref}' and _is_sha(_segment) else _placeholders[0])
+            _placeholders = _placeholders[1:]
+        elif _segment.isdigit():
+            _template.append('{id}')
+        elif _is_sha(_segment):
+            _template.append('{sha}')
+        else:
+            _template.append(_segment)
+            if _segment in _PATHS and _index < len(_segments) - 1:
+                _template.append(
+                    '{sha}' if _PATHS[_segment] == '{ref}' and _index == len(_segments) - 2
+                    and _is_sha(_segments[-1]) else _PATHS[_segment])
+                break
+            _placeholders = _NAMES.get(_segment, ())
+    return '/' + '/'.join(_template)
+
+
+def redact_url(url: str) -> str:
+    """Mask the credentials of a URL (signed storage URLs)
+    :param url: URL
+    :returns: URL without credentials"""
+    _url = urllib.parse.urlsplit(url)
+    if not _url.query and '@' not in _url.netloc:
+        return url
+    _query = urllib.parse.urlencode(
+        [(_key, REDACTED if _key.lower() in SENSITIVE_PARAMS else _value)
+         for _key, _value in urllib.parse.parse_qsl(_url.query, keep_blank_values=True)],
+        safe='*')
+    return urllib.parse.urlunsplit(
+        (_url.scheme, _url.netloc.rsplit('@', 1)[-1], _url.path, _query, _url.fragment))
+
+
+def redact_request(request: dict) -> dict:
+    """Mask the credentials of a request
+    :param request: requests arguments
+    :returns: Copy of the arguments without credentials"""
+    _request = dict(request)
+    if 'url' in _request:
+        _request['url'] = redact_url(_request['url'])
+    if _request.get('headers'):
+        _request['headers'] = {
+            _key: REDACTED if _key.lower() in SENSITIVE_HEADERS else _value
+            for _key, _value in _request['headers'].items()}
+    return _request
+
+
+# pylint: disable=too-many-arguments,too-many-positional-arguments
+def request_event(method: str, request: dict, duration: float, attempts: int,
+                  response=None, error: Exception = None) -> dict:
+    """Describe a request sent to GitHub
+    :param method: HTTP method
+    :param request: requests arguments
+    :param duration: Time in seconds spent sending the request (retries included)
+    :param attempts: Number of attempts
+    :param response: Final response (if any)
+    :param error: Exception raised by the last attempt (if any)
+    :returns: Event"""
+    _data = request.get('data')
+    _event = {
+        'kind': 'request', 'method': method.upper(),
+        'endpoint': endpoint_template(request['url']), 'url': redact_url(request['url']),
+        'status': None, 'error': None, 'duration': duration, 'retries': attempts - 1,
+        'request_bytes': len(_data) if isinstance(_data, (str, bytes)) else 0,
+        'response_bytes': None, 'rate_resource': None, 'rate_remaining': None}
+    if error is not None:
+        _event['error'] = type(error).__name__
+    if response is not None:
+        _headers = response.headers
+        _event['status'] = response.status_code
+        if _headers.get('Content-Length') is not None:
+            _event['response_bytes'] = int(_headers['Content-Length'])
+        elif not request.get('stream'):
+            _event['response_bytes'] = len(response.content or b'')
+        if _headers.get('X-RateLimit-Remaining') is not None:
+            _event['rate_resource'] = _headers.get('X-RateLimit-Resource', 'core')
+            _event['rate_remaining'] = int(_headers['X-RateLimit-Remaining'])
+    return _event
+
+
+def _labels(**labels) -> str:
+    """Format Prometheus labels
+    :param labels: Label values
+    :returns: Labels text"""
+    _escaped = {
+        _key: str(_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for _key, _value in labels.items()}
+    return '{' + ','.join(f'{_key}="{_value}"' for _key, _value in _escaped.items()) + '}'
+
+
+# pylint: disable=too-many-instance-attributes
+class PrometheusMetrics:
+    """Aggregate the request events per endpoint template (Prometheus text exposition)"""
+    def __init__(self, buckets: tuple = BUCKETS, prefix: str = 'github'):
+        """Contructor
+        :param buckets: Upper bounds in seconds of the latency histogram buckets
+        :param prefix: Metric names prefix"""
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._requests = {}
+        self._durations = {}
+        self._bytes = {}
+        self._retries = {}
+        self._remaining = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        """Record an event
+        :param event: Request or download event"""
+        _key = (event['kind'], event['method'], event['endpoint'])
+        _status = event['status'] if event['error'] is None else event['error']
+        with self._lock:
+            self._requests[(*_key, _status)] = self._requests.get((*_key, _status), 0) + 1
+            _histogram = self._durations.setdefault(_key, [0] * (len(self.buckets) + 2))
+            for _index, _bound in enumerate(self.buckets):
+                if event['duration'] <= _bound:
+                    _histogram[_index] += 1
+            _histogram[-2] += event['duration']
+            _histogram[-1] += 1
+            _sent, _received = self._bytes.get(_key, (0, 0))
+            self._bytes[_key] = (_sent + (event.get('request_bytes') or 0),
+                                 _received + (event.get('response_bytes') or 0))
+            self._retries[_key] = self._retries.get(_key, 0) + (event.get('retries') or 0)
+            if event.get('rate_remaining') is not None:
+                self._remaining[event['rate_resource']] = event['rate_remaining']
+
+    def summary(self) -> list:
+        """Get the endpoints sorted by total time spent
+        :returns: kind, method, endpoint, count and total duration of each endpoint"""
+        with self._lock:
+            return sorted(
+                ({'kind': _key[0], 'method': _key[1], 'endpoint': _key[2],
+                  'count': _histogram[-1], 'duration': _histogram[-2]}
+                 for _key, _histogram in self._durations.items()),
+                key=lambda _item: _item['duration'], reverse=True)
+
+    def _histogram_lines(self) -> list:
+        """Format the latency histograms (lock held)
+        :returns: Exposition lines"""
+        _name = f"{self.prefix}_request_duration_seconds"
+        _lines = [f"# HELP {_name} Time spent per request, retries included",
+                  f"# TYPE {_name} histogram"]
+        for (_kind, _method, _endpoint), _histogram in sorted(self._durations.items()):
+            _labels_values = {'kind': _kind, 'method': _method, 'endpoint': _endpoint}
+            for _index, _bound in enumerate(self.buckets):
+                _lines.append(
+                    f"{_name}_bucket{_labels(**_labels_values, le=_bound)} {_histogram[_index]}")
+            _lines += [f"{_name}_bucket{_labels(**_labels_values, le='+Inf')} {_histogram[-1]}",
+                       f"{_name}_sum{_labels(**_labels_values)} {_histogram[-2]}",
+                       f"{_name}_count{_labels(**_labels_values)} {_histogram[-1]}"]
+        return _lines
+
+    def render(self) -> str:
+        """Format the metrics in the Prometheus text exposition format
+        :returns: Metrics text"""
+        _prefix = self.prefix
+        with self._lock:
+            _lines = [f"# HELP {_prefix}_requests_total Requests sent per status",
+                      f"# TYPE {_prefix}_requests_total counter"]
+            for (_kind, _method, _endpoint, _status), _count in sorted(
+                    self._requests.items(), key=lambda _item: tuple(map(str, _item[0]))):
+                _lines.append(f"{_prefix}_requests_total" + _labels(
+                    kind=_kind, method=_method, endpoint=_endpoint, status=_status)
+                    + f" {_count}")
+            _lines += self._histogram_lines()
+            _lines += [f"# HELP {_prefix}_transferred_bytes_total Bytes sent and received",
+                       f"# TYPE {_prefix}_transferred_bytes_total counter"]
+            for (_kind, _method, _endpoint), _bytes in sorted(self._bytes.items()):
+                for _direction, _value in zip(('sent', 'received'), _bytes):
+                    _lines.append(f"{_prefix}_transferred_bytes_total" + _labels(
+                        kind=_kind, method=_method, endpoint=_endpoint, direction=_direction)
+                        + f" {_value}")
+            _lines += [f"# HELP {_prefix}_retries_total Requests sent again",
+                       f"# TYPE {_prefix}_retries_total counter"]
+            for (_kind, _method, _endpoint), _count in sorted(self._retries.items()):
+                _lines.append(f"{_prefix}_retries_total" + _labels(
+                    kind=_kind, method=_method, endpoint=_endpoint) + f" {_count}")
+            _lines += [f"# HELP {_prefix}_rate_limit_remaining Requests left in the quota",
+                       f"# TYPE {_prefix}_rate_limit_remaining gauge"]
+            for _resource, _remaining in sorted(self._remaining.items()):
+                _lines.append(
+                    f"{_prefix}_rate_limit_remaining{_labels(resource=_resource)} {_remaining}")
+        return '\n'.join(_lines) + '\n'
+
+
+# pylint: disable=too-few-public-methods
+class LoggingMetrics:
+    """Write the request events as structured log records (JSON messages)"""
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        """Contructor
+        :param logger: Logger (default: 'github' logger)
+        :param level: Level of the records"""
+        self.logger = logger or logging.getLogger('github')
+        self.level = level
+
+    def __call__(self, event: dict):
+        """Log an event (the event dict is also set as the 'github' record attribute)
+        :param event: Request or download event"""
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps(event, sort_keys=True),
+                            extra={'github': event})
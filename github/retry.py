@@ -0,0 +1,192 @@
+"""Retry policy for GitHub API requests"""
+
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import requests
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff, aware of the GitHub rate limits"""
+    IDEMPOTENT_METHODS = frozenset(('get', 'head', 'options', 'put', 'delete'))
+    RETRY_STATUSES = frozenset((500, 502, 503, 504))
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, max_attempts: int = 5, backoff_factor: float = 1.0,
+                 max_backoff: float = 60.0, jitter: bool = True,
+                 max_rate_limit_wait: float = 3600.0):
+        """Contructor
+        :param max_attempts: Maximum number of attempts per request (1 disables retries)
+        :param backoff_factor: Base delay in seconds (doubled on each attempt)
+        :param max_backoff: Maximum delay between two attempts
+        :param jitter: Randomize the delays (full jitter)
+        :param max_rate_limit_wait: Maximum time to wait for a rate limit reset"""
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_rate_limit_wait = max_rate_limit_wait
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff delay
+        :param attempt: Number of the attempt which failed (starting at 1)
+        :returns: Delay in seconds"""
+        _delay = min(self.max_backoff, self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            _delay = random.uniform(0, _delay)
+        return _delay
+
+    def rate_limit_delay(self, response: requests.Response) -> float:
+        """Time to wait before a rate-limited request can be sent again
+        :param response: Response
+        :returns: Delay in seconds (None if the response is not rate-limited)"""
+        if response.status_code not in (403, 429):
+            return None
+        _headers = response.headers
+        if _headers.get('Retry-After'):
+            return float(_headers['Retry-After'])
+        if _headers.get('X-RateLimit-Remaining') == '0' and _headers.get('X-RateLimit-Reset'):
+            return max(float(_headers['X-RateLimit-Reset']) - time.time(), 0) + 1
+        if response.status_code == 429 or 'secondary rate limit' in response.text.lower():
+            # GitHub asks to wait at least one minute when no header is set
+            return 60.0
+        return None
+
+    def delay(self, method: str, attempt: int, response: requests.Response = None,
+              error: Exception = None) -> float:
+        """Get the delay before retrying a request
+        :param method: HTTP method
+        :param attempt: Number of the attempt which failed (starting at 1)
+        :param response: Response received (if any)
+        :param error: Exception raised while sending the request (if any)
+        :returns: Delay in seconds (None if the request must not be retried)"""
+        if attempt >= self.max_attempts:
+            return None
+        if response is None:
+            _retryable = isinstance(error, requests.exceptions.ConnectTimeout) or (
+                isinstance(error, (requests.exceptions.ConnectionError,
+                                   requests.exceptions.Timeout)) and self.idempotent(method))
+            return self.backoff(attempt) if _retryable else None
+        _delay = self.rate_limit_delay(response)
+        if _delay is not None:
+            # rate-limited requests have not been processed: always safe to resend
+            return _delay if _delay <= self.max_rate_limit_wait else None
+        if response.status_code in self.RETRY_STATUSES and self.idempotent(method):
+            return self.backoff(attempt)
+        return None
+
+    def idempotent(self, method: str) -> bool:
+        """Check if a request can be sent twice without side effects
+        :param method: HTTP method
+        :returns: True if idempotent"""
+        return method.lower() in self.IDEMPOTENT_METHODS
+
+
+class SearchQuota:
+    """Client-side throttle of a Search API quota (separate from the core rate limit)
+
+    Requests are spaced so that no more than `limit` are sent within `period`
+    seconds, and the quota reported by GitHub (X-RateLimit-* headers of the
+    quota resource: 'search', or 'code_search' for the code search) is honoured
+    when known"""
+    def __init__(self, limit: int = 30, period: float = 60.0, resource: str = 'search'):
+        """Contructor
+        :param limit: Maximum number of search requests per period
+        :param period: Period in seconds
+        :param resource: Rate limit resource (X-RateLimit-Resource header)"""
+        self.limit = limit
+        self.period = period
+        self.resource = resource
+        self._sent = deque()
+        self._remaining = None
+        self._reset = None
+        self._lock = threading.Lock()
+
+    def _wait_time(self, now: float) -> float:
+        """Time to wait before the next search request (lock held)
+        :param now: Current time
+        :returns: Delay in seconds (0 if a request can be sent)"""
+        while self._sent and self._sent[0] <= now - self.period:
+            self._sent.popleft()
+        if self._remaining == 0 and self._reset and self._reset > now:
+            return self._reset - now
+        if len(self._sent) >= self.limit:
+            return self._sent[0] + self.period - now
+        return 0
+
+    def _take(self) -> float:
+        """Account for a search request if one can be sent now
+        :returns: Delay in seconds before retrying (0 if the request was accounted for)"""
+        with self._lock:
+            _now = time.time()
+            _delay = self._wait_time(_now)
+            if _delay <= 0:
+                self._sent.append(_now)
+                if self._remaining:
+                    self._remaining -= 1
+                return 0
+            return _delay
+
+    def acquire(self):
+        """Wait until a search request can be sent and account for it"""
+        while True:
+            _delay = self._take()
+            if _delay <= 0:
+                return
+            time.sleep(_delay)
+
+    async def aacquire(self):
+        """Wait until a search request can be sent and account for it (asyncio)"""
+        while True:
+            _delay = self._take()
+            if _delay <= 0:
+                return
+            await asyncio.sleep(_delay)
+
+    def update(self, response: requests.Response):
+        """Read the remaining quota from a Search API response
+        :param response: Response"""
+        _headers = response.headers
+        if _headers.get('X-RateLimit-Resource') != self.resource \
+                or _headers.get('X-RateLimit-Remaining') is None:
+            return
+        with self._lock:
+            self._remaining = int(_headers['X-RateLimit-Remaining'])
+            self._reset = float(_headers.get('X-RateLimit-Reset') or 0) or None
+
+
+class RateBudget:
+    """Core API quota shared by the clients of a session
+
+    The remaining quota is read from the X-RateLimit-* headers of the responses,
+    so bulk jobs can pause before exhausting it instead of being rate-limited"""
+    def __init__(self):
+        """Contructor"""
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def update(self, response: requests.Response):
+        """Read the remaining quota from a response
+        :param response: Response"""
+        _headers = response.headers
+        if _headers.get('X-RateLimit-Resource', 'core') != 'core' \
+                or _headers.get('X-RateLimit-Remaining') is None:
+            return
+        with self._lock:
+            self.remaining = int(_headers['X-RateLimit-Remaining'])
+            self.reset = float(_headers.get('X-RateLimit-Reset') or 0) or None
+
+    def wait(self, reserve: int = 0):
+        """Wait until more than `reserve` requests are left (or the quota is reset)
+        :param reserve: Number of requests kept for other jobs"""
+        while True:
+            with self._lock:
+                _now = time.time()
+                if self.remaining is None or self.remaining > reserve \
+                        or not self.reset or self.reset <= _now:
+                    return
+                _delay = self.reset - _now + 1
+            time.sleep(_delay)
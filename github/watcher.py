@@ -0,0 +1,157 @@
+"""Track many workflow runs with a single polling loop"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+
+# pylint: disable=too-many-instance-attributes
+class RunWatcher:
+    """Follow the status of workflow runs of a repository
+
+    Each tick refreshes all the tracked runs with one filtered listing of the
+    repository runs (conditional requests when the repository has a cache),
+    fires the callbacks of the runs whose status changed, and resolves the
+    future of each completed run. The poll interval grows with the age of the
+    youngest running run. The watcher can be driven by a thread (start / run)
+    or by an asyncio task (arun)"""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, repository, min_interval: float = 5.0, max_interval: float = 60.0,
+                 age_factor: float = 0.1, page_size: int = 100):
+        """Contructor
+        :param repository: GitHubRepository owning the runs
+        :param min_interval: Minimum delay in seconds between two ticks
+        :param max_interval: Maximum delay in seconds between two ticks
+        :param age_factor: Poll interval as a fraction of the youngest run age
+        :param page_size: Number of runs listed to find runs never seen before"""
+        self.repository = repository
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self.page_size = page_size
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending())
+
+    def watch(self, run_id: int, callback=None) -> Future:
+        """Track a run
+        :param run_id: Run ID (e.g. returned by execute_workflow)
+        :param callback: Function called with the run JSON on each status change
+        :returns: Future resolved with the run JSON once completed
+                  (asyncio.wrap_future makes it awaitable)"""
+        with self._lock:
+            if run_id not in self._runs:
+                self._runs[run_id] = {'run': None, 'future': Future(), 'callbacks': []}
+            _entry = self._runs[run_id]
+            if callback:
+                _entry['callbacks'].append(callback)
+            return _entry['future']
+
+    def _pending(self) -> dict:
+        """Get the runs not completed yet
+        :returns: Entry of each run ID"""
+        with self._lock:
+            return {_id: _entry for _id, _entry in self._runs.items()
+                    if not _entry['future'].done()}
+
+    def _update(self, run: dict):
+        """Store the latest state of a run and notify its watchers
+        :param run: Run JSON"""
+        with self._lock:
+            _entry = self._runs[run['id']]
+            _previous = _entry['run'] or {}
+            _entry['run'] = run
+        if (_previous.get('status'), _previous.get('conclusion')) != \
+                (run.get('status'), run.get('conclusion')):
+            for _callback in _entry['callbacks']:
+                _callback(run)
+        if run.get('status') == 'completed' and not _entry['future'].done():
+            _entry['future'].set_result(run)
+
+    def poll(self):
+        """Refresh all the tracked runs (one tick)"""
+        _pending = self._pending()
+        if not _pending:
+            return
+        _missing = set(_pending)
+        _created = [_entry['run']['created_at'] for _entry in _pending.values() if _entry['run']]
+        if len(_created) == len(_pending):
+            # every run is known: list the runs created since the oldest one
+            # (bounded: the runs not found are read one by one below)
+            _runs = self.repository.list_runs(
+                created=f">={min(_created)}", max_items=self.page_size)
+        else:
+            # new runs are the most recent ones
+            _runs = self.repository.list_runs(max_items=self.page_size)
+        for _run in _runs:
+            if _run['id'] in _missing:
+                self._update(_run)
+                _missing.discard(_run['id'])
+                if not _missing:
+                    break
+        for _run_id in _missing:
+            self._update(self.repository.get_run(_run_id))
+
+    def next_interval(self) -> float:
+        """Get the delay before the next tick
+        :returns: Delay in seconds"""
+        _now = time.time()
+        _ages = [
+            _now - datetime.strptime(_entry['run']['created_at'], '%Y-%m-%dT%H:%M:%SZ')
+            .replace(tzinfo=timezone.utc).timestamp()
+            for _entry in self._pending().values() if _entry['run']]
+        if not _ages:
+            return self.min_interval
+        return min(max(min(_ages) * self.age_factor, self.min_interval), self.max_interval)
+
+    def run(self, timeout: float = None):
+        """Poll until all the tracked runs are completed (blocking)
+        :param timeout: Maximum time in seconds (default: no limit)"""
+        _deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop.is_set():
+            self.poll()
+            if not self._pending():
+                return
+            _interval = self.next_interval()
+            if _deadline is not None:
+                if time.monotonic() >= _deadline:
+                    raise TimeoutError(f"{len(self)} runs still running")
+                _interval = min(_interval, _deadline - time.monotonic())
+            self._stop.wait(_interval)
+
+    def start(self) -> threading.Thread:
+        """Poll in a background thread until all the tracked runs are completed
+        :returns: Polling thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Stop the polling loop"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def arun(self, timeout: float = None):
+        """Poll from an asyncio task until all the tracked runs are completed
+        (the requests are sent from a worker thread)
+        :param timeout: Maximum time in seconds (default: no limit)"""
+        _deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            await asyncio.to_thread(self.poll)
+            if not self._pending():
+                return
+            _interval = self.next_interval()
+            if _deadline is not None:
+                if time.monotonic() >= _deadline:
+                    raise TimeoutError(f"{len(self)} runs still running")
+                _interval = min(_interval, _deadline - time.monotonic())
+            await asyncio.sleep(_interval)
@@ -19,5 +19,8 @@ setup(
     install_requires=[
         'requests>=2.32.3',
         'PyNaCl>=1.5.0'
-    ]
+    ],
+    extras_require={
+        'async': ['aiohttp>=3.8']
+    }
 )
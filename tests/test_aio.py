@@ -0,0 +1,108 @@
+import os
+import sys
+import asyncio
+import unittest
+import requests
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import github.aio
+
+
+def response(status_code, content=b'', headers=None):
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    res._content = content
+    return res
+
+
+def mock_session(*responses):
+    session = mock.Mock()
+    session.hooks = []
+    session.request = mock.AsyncMock(side_effect=list(responses))
+    return session
+
+
+class AioTests(unittest.TestCase):
+    def test_get_run(self):
+        session = mock_session(response(200, b'{"id": 2}'))
+        ghr = github.aio.AsyncGitHubRepository('TOKEN', 'imtf-devops/reponame', session=session)
+        self.assertEqual(asyncio.run(ghr.get_run(2)), {'id': 2})
+        session.request.assert_awaited_once_with('get', url='https://api.github.com/repos/imtf-devops/reponame/actions/runs/2', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+
+    def test_list_runs(self):
+        session = mock_session(
+            response(200, b'{"workflow_runs": [{"id": 1}]}', {'Link': '<https://api.github.com/repositories/1/actions/runs?page=2>; rel="next"'}),
+            response(200, b'{"workflow_runs": [{"id": 2}]}'))
+        ghr = github.aio.AsyncGitHubRepository('TOKEN', 'imtf-devops/reponame', session=session)
+
+        async def _list():
+            return [_run async for _run in ghr.list_runs()]
+        self.assertEqual(asyncio.run(_list()), [{'id': 1}, {'id': 2}])
+        self.assertEqual(session.request.await_args_list[1].kwargs['url'], 'https://api.github.com/repositories/1/actions/runs?page=2')
+
+    def test_pull_request_approved(self):
+        session = mock_session(
+            response(200, b'[{"state": "CHANGES_REQUESTED", "user": {"login": "a"}}]', {'Link': '<https://api.github.com/repositories/1/pulls/2/reviews?page=2>; rel="next"'}),
+            response(200, b'[{"state": "APPROVED", "user": {"login": "a"}}]'))
+        ghr = github.aio.AsyncGitHubRepository('TOKEN', 'imtf-devops/reponame', session=session)
+        self.assertTrue(asyncio.run(ghr.pull_request_approved(2)))
+        self.assertEqual(session.request.await_count, 2)
+
+    def test_find(self):
+        session = mock_session(
+            response(200, b'{"total_count": 3, "incomplete_results": true, "items": [{"id": 1}, {"id": 2}]}', {'Link': '<https://api.github.com/search/code?page=2>; rel="next"'}),
+            response(200, b'{"total_count": 3, "incomplete_results": false, "items": [{"id": 3}]}', {'Link': '<https://api.github.com/search/code?page=3>; rel="next"'}))
+        session.search_quotas = {'code_search': mock.Mock(aacquire=mock.AsyncMock())}
+        gho = github.aio.AsyncGitHubOrganization('TOKEN', 'imtf-devops', session=session)
+        self.assertEqual(asyncio.run(gho.find('foo')), [{'id': 1}, {'id': 2}, {'id': 3}])
+        self.assertEqual(session.request.await_count, 2)
+        self.assertEqual(session.search_quotas['code_search'].aacquire.await_count, 2)
+        self.assertEqual(session.search_quotas['code_search'].update.call_count, 2)
+
+    def test_list_repositories(self):
+        session = mock_session(
+            response(200, b'[{"full_name": "imtf-devops/repo-1"}]'))
+        gho = github.aio.AsyncGitHubOrganization('TOKEN', 'imtf-devops', session=session)
+
+        async def _list():
+            return [_repo async for _repo in gho.list_repositories()]
+        repos = asyncio.run(_list())
+        self.assertEqual([_repo.name for _repo in repos], ['imtf-devops/repo-1'])
+        self.assertIs(repos[0].session, session)
+
+    def test_http_error(self):
+        session = mock_session(response(404))
+        ghr = github.aio.AsyncGitHubRepository('TOKEN', 'imtf-devops/reponame', session=session)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            asyncio.run(ghr.get_run(2))
+
+    def test_retry(self):
+        session = mock_session(
+            response(503), response(200, b'{"id": 2}'))
+        ghr = github.aio.AsyncGitHubRepository(
+            'TOKEN', 'imtf-devops/reponame', session=session,
+            retry=github.RetryPolicy(backoff_factor=0))
+        self.assertEqual(asyncio.run(ghr.get_run(2)), {'id': 2})
+        self.assertEqual(session.request.await_count, 2)
+
+    def test_session_request(self):
+        mock_aiohttp = mock.Mock()
+        mock_response = mock.Mock(status=200, reason='OK', headers={'ETag': '"abc"'})
+        mock_response.read = mock.AsyncMock(return_value=b'{"id": 2}')
+        mock_aiohttp.ClientSession.return_value.closed = False
+        mock_aiohttp.ClientSession.return_value.request.return_value.__aenter__ = mock.AsyncMock(return_value=mock_response)
+        mock_aiohttp.ClientSession.return_value.request.return_value.__aexit__ = mock.AsyncMock(return_value=False)
+        with mock.patch('github.aio.aiohttp', mock_aiohttp):
+            session = github.aio.AsyncGitHubSession(concurrency=2)
+            res = asyncio.run(session.request('get', url='https://api.github.com/', timeout=3))
+        self.assertEqual(res.json(), {'id': 2})
+        self.assertEqual(res.headers['etag'], '"abc"')
+        mock_aiohttp.ClientSession.return_value.request.assert_called_once_with(
+            'GET', timeout=mock_aiohttp.ClientTimeout.return_value, url='https://api.github.com/')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import github.cache
+
+
+class CacheTests(unittest.TestCase):
+    def test_memory_cache_lru(self):
+        cache = github.cache.MemoryCache(maxsize=2)
+        cache.set('a', {'body': 1})
+        cache.set('b', {'body': 2})
+        self.assertEqual(cache.get('a'), {'body': 1})
+        cache.set('c', {'body': 3})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'body': 1})
+        self.assertEqual(len(cache), 2)
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache = github.cache.DiskCache(tmpdirname)
+            self.assertIsNone(cache.get('key'))
+            cache.set('key', {'etag': '"abc"', 'body': [1, 2]})
+            self.assertEqual(github.cache.DiskCache(tmpdirname).get('key'), {'etag': '"abc"', 'body': [1, 2]})
+            cache.delete('key')
+            self.assertIsNone(cache.get('key'))
+            cache.set('key', {'body': {}})
+            cache.clear()
+            self.assertEqual(os.listdir(tmpdirname), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import github.graphql
+
+REPOSITORY = {
+    'id': 'R_1', 'databaseId': 1, 'name': 'repo-1', 'nameWithOwner': 'imtf-devops/repo-1',
+    'description': None, 'url': 'https://github.com/imtf-devops/repo-1', 'homepageUrl': None,
+    'isPrivate': True, 'isArchived': False, 'isFork': False, 'isDisabled': False,
+    'visibility': 'PRIVATE', 'createdAt': '2024-01-01T00:00:00Z', 'updatedAt': '2024-01-01T00:00:00Z',
+    'pushedAt': '2024-01-01T00:00:00Z', 'stargazerCount': 0, 'forkCount': 0,
+    'owner': {'login': 'imtf-devops'}, 'defaultBranchRef': {'name': 'main'}, 'primaryLanguage': None}
+
+
+def review(login, state):
+    return {'id': f'PRR_{login}', 'databaseId': 1, 'state': state, 'submittedAt': '2024-01-01T00:00:00Z', 'author': {'login': login}}
+
+
+class GraphQLTests(unittest.TestCase):
+    def test_repositories_split_by_aliases(self):
+        client = mock.Mock()
+        client.graphql.side_effect = [
+            {'data': {'q0': REPOSITORY, 'q1': None}, 'errors': [{'type': 'NOT_FOUND'}]},
+            {'data': {'q0': REPOSITORY}}]
+        batch = github.graphql.GraphQLBatch(client, max_aliases=2)
+        for name in ('imtf-devops/repo-1', 'imtf-devops/missing', 'imtf-devops/repo-3'):
+            batch.repository(name)
+        results = batch.execute()
+        self.assertEqual(client.graphql.call_count, 2)
+        self.assertEqual(results['imtf-devops/repo-1']['default_branch'], 'main')
+        self.assertEqual(results['imtf-devops/repo-1']['visibility'], 'private')
+        self.assertIsNone(results['imtf-devops/missing'])
+        query, variables = client.graphql.mock_calls[0].args
+        self.assertIn('q1: repository(owner: $o1, name: $n1)', query)
+        self.assertEqual(variables, {'o0': 'imtf-devops', 'n0': 'repo-1', 'o1': 'imtf-devops', 'n1': 'missing'})
+
+    def test_split_on_limit_error(self):
+        client = mock.Mock()
+        client.graphql.side_effect = [
+            {'errors': [{'type': 'MAX_NODE_LIMIT_EXCEEDED', 'message': 'too big'}]},
+            {'data': {'q0': REPOSITORY}},
+            {'data': {'q0': REPOSITORY}}]
+        batch = github.graphql.GraphQLBatch(client)
+        batch.repository('imtf-devops/repo-1')
+        batch.repository('imtf-devops/repo-2')
+        self.assertEqual(len(batch.execute()), 2)
+        self.assertEqual(client.graphql.call_count, 3)
+
+    def test_error(self):
+        client = mock.Mock()
+        client.graphql.return_value = {'errors': [{'type': 'FORBIDDEN', 'message': 'denied'}]}
+        batch = github.graphql.GraphQLBatch(client)
+        batch.repository('imtf-devops/repo-1')
+        with self.assertRaises(github.graphql.GraphQLError):
+            batch.execute()
+
+    def test_reviews_pagination(self):
+        client = mock.Mock()
+        client.graphql.side_effect = [
+            {'data': {'q0': {'pullRequest': {'reviews': {'nodes': [review('a', 'COMMENTED')], 'pageInfo': {'hasNextPage': True, 'endCursor': 'C1'}}}}}},
+            {'data': {'q0': {'pullRequest': {'reviews': {'nodes': [review('b', 'APPROVED')], 'pageInfo': {'hasNextPage': False, 'endCursor': 'C2'}}}}}}]
+        batch = github.graphql.GraphQLBatch(client)
+        key = batch.reviews('imtf-devops/repo-1', 3)
+        results = batch.execute()
+        self.assertEqual([(r['user']['login'], r['state']) for r in results[key]], [('a', 'COMMENTED'), ('b', 'APPROVED')])
+        self.assertEqual(client.graphql.mock_calls[1].args[1], {'o0': 'imtf-devops', 'n0': 'repo-1', 'p0': 3, 'c0': 'C1'})
+
+    def test_concurrent_batches(self):
+        client = mock.Mock()
+        client.graphql.return_value = {'data': {'q0': REPOSITORY}}
+        batch = github.graphql.GraphQLBatch(client, max_aliases=1)
+        for name in ('imtf-devops/repo-1', 'imtf-devops/repo-2', 'imtf-devops/repo-3'):
+            batch.repository(name)
+        results = batch.execute(max_workers=3)
+        self.assertEqual(sorted(results), ['imtf-devops/repo-1', 'imtf-devops/repo-2', 'imtf-devops/repo-3'])
+        self.assertEqual(client.graphql.call_count, 3)
+        self.assertEqual(len(batch), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
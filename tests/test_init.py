@@ -1,5 +1,13 @@
 import os
 import sys
+import io
+import base64
+import json
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import urllib.parse
 import unittest
 import requests
 from unittest import mock
@@ -8,12 +16,36 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
 
 import github
 
+
+def mock_requests():
+    """requests module mock whose pooled sessions forward to the module calls"""
+    mock_req = mock.Mock()
+    mock_req.Session.return_value = mock_req
+    return mock_req
+
+
+def stream_response(data, status_code=200, url='https://api.github.com/file', headers=None, drop_after=None):
+    res = requests.Response()
+    res.status_code = status_code
+    res.url = url
+    res.headers.update({'Content-Length': str(len(data)), 'Accept-Ranges': 'bytes', **(headers or {})})
+    raw = io.BytesIO(data)
+    if drop_after is not None:
+        def _read(size, _read=raw.read):
+            if raw.tell() >= drop_after:
+                raise requests.exceptions.ConnectionError('dropped')
+            return _read(min(size, drop_after - raw.tell()))
+        raw.read = _read
+    res.raw = raw
+    return res
+
+
 class InitTests(unittest.TestCase):
     def test_get_attribute(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {"name": "repo", "id": 1}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('builtins.print', mock.Mock()):
@@ -21,11 +53,146 @@ class InitTests(unittest.TestCase):
                 gho = github.GitHubRepository('TOKEN', 'repo', True)
                 self.assertEqual(gho.name, "repo")
 
+    def test_session_shared(self):
+        session = github.GitHubSession.shared('test-shared')
+        self.assertIs(github.GitHubSession.shared('test-shared'), session)
+        self.assertIsNot(github.GitHubSession.shared('test-other'), session)
+
+    def test_session_stats(self):
+        session = github.GitHubSession(pool_size=2)
+        self.assertEqual(session.stats(), {'opened': 0, 'reused': 0})
+        session._adapter.poolmanager.pools['api.github.com'] = mock.Mock(
+            num_connections=1, num_requests=5)
+        self.assertEqual(session.stats(), {'opened': 1, 'reused': 4})
+
+    def test_session_used_by_client(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'id': 2}
+        mock_session = mock.Mock()
+        mock_session.hooks = []
+        mock_session.request.return_value = mock_res
+        ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame', session=mock_session)
+        self.assertEqual(ghr.get_run(2), {'id': 2})
+        mock_session.request.assert_called_once_with('get', url='https://api.github.com/repos/imtf-devops/reponame/actions/runs/2', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+
+    def test_conditional_request_cache(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.headers = {'ETag': '"abc"'}
+        mock_res.json.return_value = {'id': 2}
+        mock_res_304 = mock.Mock()
+        mock_res_304.status_code = requests.codes.not_modified
+        mock_req = mock_requests()
+        mock_req.get.side_effect = [mock_res, mock_res_304]
+        mock_req.codes = requests.codes
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame', cache=github.MemoryCache())
+            self.assertEqual(ghr.get_run(2), {'id': 2})
+            self.assertEqual(ghr.get_run(2), {'id': 2})
+            self.assertEqual(mock_req.get.mock_calls[1], mock.call(url='https://api.github.com/repos/imtf-devops/reponame/actions/runs/2', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28', 'If-None-Match': '"abc"'}, timeout=3))
+            mock_res_304.json.assert_not_called()
+
+    def test_retry_rate_limited_request(self):
+        res_limited = requests.Response()
+        res_limited.status_code = 429
+        res_limited.headers['Retry-After'] = '5'
+        res_ok = requests.Response()
+        res_ok.status_code = 200
+        res_ok._content = b'{"id": 2}'
+        mock_sleep = mock.Mock()
+        mock_req_get = mock.Mock(side_effect=[requests.exceptions.ReadTimeout(), res_limited, res_ok])
+        with mock.patch('time.sleep', mock_sleep):
+            with mock.patch('github.requests.Session.get', mock_req_get):
+                ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame', retry=github.RetryPolicy(jitter=False))
+                self.assertEqual(ghr.get_run(2), {'id': 2})
+        self.assertEqual(mock_sleep.mock_calls, [mock.call(1), mock.call(5.0)])
+
+    def test_from_json(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'full_name': 'imtf-devops/reponame', 'default_branch': 'main', 'subscribers_count': 3}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository.from_json('TOKEN', {'full_name': 'imtf-devops/reponame', 'default_branch': 'main'}, debug=False)
+            self.assertEqual(ghr.name, 'imtf-devops/reponame')
+            self.assertEqual(ghr.default_branch, 'main')
+            mock_req.get.assert_not_called()
+            self.assertEqual(ghr.subscribers_count, 3)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+            with self.assertRaises(AttributeError):
+                ghr.url
+            self.assertEqual(mock_req.get.call_count, 1)
+            gho = github.GitHubOrganization.from_json('TOKEN', {'login': 'imtf-devops', 'url': 'https://api.github.com/orgs/imtf-devops'})
+            self.assertEqual(gho.name, 'imtf-devops')
+            ghq = github.GitHubRequests.from_json('TOKEN', {'url': 'https://api.github.com/orgs/imtf-devops', 'id': 2})
+            self.assertEqual(ghq._endpoint, 'orgs/imtf-devops')
+
+    def test_get_attribute_ttl(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.side_effect = [{'name': 'repo', 'size': 1}, {'name': 'repo', 'size': 2}]
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            with mock.patch('time.time', mock.Mock(side_effect=[100, 150, 200, 200])):
+                ghr = github.GitHubRepository('TOKEN', 'repo', ttl=60)
+                self.assertEqual(ghr.size, 1)
+                self.assertEqual(ghr.size, 1)
+                self.assertEqual(ghr.size, 2)
+            self.assertEqual(mock_req.get.call_count, 2)
+
+    def test_get_attribute_empty_payload(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'repo')
+            for _ in range(2):
+                with self.assertRaises(AttributeError):
+                    ghr.size
+            mock_req.get.assert_called_once()
+
+    def test_get_attribute_refresh_and_prefetch(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.side_effect = [{'size': 1, 'id': 1}, {'size': 2, 'id': 1}]
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'repo').prefetch('size')
+            self.assertEqual(mock_req.get.call_count, 1)
+            self.assertEqual(ghr.size, 1)
+            self.assertEqual(ghr.refresh().size, 2)
+            self.assertEqual(ghr.id, 1)
+            self.assertEqual(mock_req.get.call_count, 2)
+
+    def test_get_attribute_shared_content(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'name': 'repo', 'size': 1}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        content_cache = github.MemoryCache()
+        with mock.patch('github.requests', mock_req):
+            self.assertEqual(github.GitHubRepository('TOKEN', 'repo', content_cache=content_cache).size, 1)
+            self.assertEqual(github.GitHubRepository('TOKEN', 'repo', content_cache=content_cache).size, 1)
+            self.assertEqual(github.GitHubRepository('OTHER', 'repo', content_cache=content_cache).size, 1)
+            self.assertEqual(mock_req.get.call_count, 2)
+
     def test_get_attribute_incorrect(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {"name": "repo", "id": 1}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -37,7 +204,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {"name": "repo", "id": 1}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -49,20 +216,24 @@ class InitTests(unittest.TestCase):
     def test_list_repos(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.side_effect = [['repo-1', 'repo-2'], []]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = [{'full_name': 'imtf-devops/repo-1'}, {'full_name': 'imtf-devops/repo-2'}]
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
-            self.assertEqual(list(gho.list_repositories()), ['repo-1', 'repo-2'])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/orgs/imtf-devops/repos?per_page=100&page=1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            repos = list(gho.list_repositories())
+            self.assertEqual([repo.name for repo in repos], ['imtf-devops/repo-1', 'imtf-devops/repo-2'])
+            self.assertEqual(repos[0].full_name, 'imtf-devops/repo-1')
+            self.assertIs(repos[0].session, gho.session)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/orgs/imtf-devops/repos?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
     def test_add_org_variable(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -74,7 +245,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -86,7 +257,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'variables': [{"name": "NEWVAR", "value": "NEWVAL"}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -97,32 +268,34 @@ class InitTests(unittest.TestCase):
     def test_list_org_find_code_in_path(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.side_effect = [{'items': [{"path": ".github/workflows/toto.yaml"}]}, {'items': []}]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = {'items': [{"path": ".github/workflows/toto.yaml"}]}
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
             self.assertEqual(gho.find("dummy", ".github/workflows"), [{"path": ".github/workflows/toto.yaml"}])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/code?q=dummy+org%3Aimtf-devops+in%3Afile+path%3A.github%2Fworkflows&per_page=100&page=1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/code?per_page=100&q=dummy+org%3Aimtf-devops+in%3Afile+path%3A.github%2Fworkflows', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
 
     def test_list_org_find_code_in_filename(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.side_effect = [{'items': [{"path": "toto.yaml"}]}, {'items': []}]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = {'items': [{"path": "toto.yaml"}]}
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
             self.assertEqual(gho.find("dummy", "toto.yaml"), [{"path": "toto.yaml"}])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/code?q=dummy+org%3Aimtf-devops+in%3Afile+filename%3Atoto.yaml&per_page=100&page=1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/code?per_page=100&q=dummy+org%3Aimtf-devops+in%3Afile+filename%3Atoto.yaml', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
 
     def test_list_org_secrets(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'secrets': [{"name": "NEWSECRET"}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -134,7 +307,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'runners': [{"id": 2}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -146,7 +319,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.delete.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -154,26 +327,137 @@ class InitTests(unittest.TestCase):
             gho.delete_runner(1)
             mock_req.delete.assert_called_once_with(url='https://api.github.com/orgs/imtf-devops/actions/runners/1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
+    def test_get_repositories(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'data': {'q0': None}, 'errors': [{'type': 'NOT_FOUND'}]}
+        mock_req = mock_requests()
+        mock_req.post.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            self.assertEqual(gho.get_repositories(['missing']), {'missing': None})
+            self.assertEqual(mock_req.post.mock_calls[0].kwargs['url'], 'https://api.github.com/graphql')
+            self.assertEqual(json.loads(mock_req.post.mock_calls[0].kwargs['data'])['variables'], {'o0': 'imtf-devops', 'n0': 'missing'})
+
     def test_get_pull_requests(self):
         mock_res_get = mock.Mock()
         mock_res_get.status_code = requests.codes.ok
-        mock_res_get.json.side_effect = [
-            {'items': [{'state': 'open', 'id': 1, 'locked': False}, {'state': 'open', 'id': 3, 'locked': True}]},
-            {'items': [{'state': 'open', 'id': 2, 'locked': False}]},
-            {'items': []}]
-        mock_req = mock.Mock()
-        mock_req.get.return_value = mock_res_get
+        mock_res_get.links = {'next': {'url': 'https://api.github.com/search/issues?page=2'}}
+        mock_res_get.json.return_value = {'items': [{'state': 'open', 'id': 1, 'locked': False}, {'state': 'open', 'id': 3, 'locked': True}]}
+        mock_res_get_2 = mock.Mock()
+        mock_res_get_2.status_code = requests.codes.ok
+        mock_res_get_2.links = {}
+        mock_res_get_2.json.return_value = {'items': [{'state': 'open', 'id': 2, 'locked': False}]}
+        mock_req = mock_requests()
+        mock_req.get.side_effect = [mock_res_get, mock_res_get_2]
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubOrganization('TOKEN', 'imtf-devops')
             self.assertEqual(ghr.get_pull_requests('open', 'toto'), [{'state': 'open', 'id': 1, 'locked': False}, {'state': 'open', 'id': 2, 'locked': False}])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/issues?q=state%3Aopen+type%3Apr+org%3Aimtf-devops+author%3Atoto&per_page=100&page=1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/search/issues?per_page=100&q=state%3Aopen+type%3Apr+org%3Aimtf-devops+author%3Atoto', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+
+    def test_iter_pull_requests_incomplete_results(self):
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {'next': {'url': 'https://api.github.com/search/issues?page=2'}}
+        mock_res_get.json.return_value = {'total_count': 500, 'incomplete_results': True, 'items': [{'id': 1, 'locked': False}, {'id': 2, 'locked': True}]}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            results = gho.iter_pull_requests('open')
+            self.assertEqual(next(results), {'id': 1, 'locked': False})
+            self.assertEqual(list(results), [])
+            mock_req.get.assert_called_once()
+
+    def test_find_incomplete_results(self):
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {'next': {'url': 'https://api.github.com/search/code?page=2'}}
+        mock_res_get.json.return_value = {'total_count': 3, 'incomplete_results': True, 'items': [{'id': 1}, {'id': 2}]}
+        mock_res_get_2 = mock.Mock()
+        mock_res_get_2.status_code = requests.codes.ok
+        mock_res_get_2.links = {}
+        mock_res_get_2.json.return_value = {'total_count': 3, 'incomplete_results': False, 'items': [{'id': 3}]}
+        mock_req = mock_requests()
+        mock_req.get.side_effect = [mock_res_get, mock_res_get_2]
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            self.assertEqual(gho.find('foo'), [{'id': 1}, {'id': 2}, {'id': 3}])
+            self.assertEqual(mock_req.get.mock_calls[1].kwargs['url'], 'https://api.github.com/search/code?page=2')
+
+    def test_find_total_count(self):
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {'next': {'url': 'https://api.github.com/search/code?page=2'}}
+        mock_res_get.json.return_value = {'total_count': 2, 'incomplete_results': False, 'items': [{'id': 1}, {'id': 2}]}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            with mock.patch.object(gho.session.search_quotas['code_search'], 'acquire') as mock_acquire:
+                self.assertEqual(list(gho.iter_find('foo', 'setup.py')), [{'id': 1}, {'id': 2}])
+                mock_acquire.assert_called_once_with()
+            mock_req.get.assert_called_once()
+            self.assertIn('q=foo+org%3Aimtf-devops+in%3Afile+filename%3Asetup.py', mock_req.get.mock_calls[0].kwargs['url'])
+
+    def test_get_pull_requests_sharded(self):
+        created = {1: '2020-01-01T00:00:00Z', 2: '2021-06-01T00:00:00Z', 3: '2022-03-01T00:00:00Z', 4: '2022-03-01T00:00:00Z'}
+
+        def _get(url, **kwargs):
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+            start, end = query['q'][0].split('created:')[1].split('..')
+            items = [{'id': x, 'locked': False} for x, date in created.items() if start <= date <= end]
+            res = mock.Mock()
+            res.status_code = requests.codes.ok
+            res.links = {}
+            res.json.return_value = {'total_count': len(items), 'incomplete_results': False, 'items': items[:int(query['per_page'][0])]}
+            return res
+        mock_req = mock_requests()
+        mock_req.get.side_effect = _get
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req), mock.patch('github.SEARCH_LIMIT', 2):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            results = gho.get_pull_requests('closed', sharded=True)
+            self.assertEqual(sorted(x['id'] for x in results), [1, 2, 3, 4])
+            self.assertIn('created%3A2008-01-01T00%3A00%3A00Z..', mock_req.get.mock_calls[0].kwargs['url'])
+
+    def test_pull_requests_approved(self):
+        def _reviews(*reviews):
+            return {'pullRequest': {'reviews': {'nodes': [
+                {'id': 'R', 'databaseId': 1, 'state': state, 'submittedAt': None, 'author': {'login': login}}
+                for login, state in reviews], 'pageInfo': {'hasNextPage': False, 'endCursor': None}}}}
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'data': {
+            'q0': _reviews(('a', 'CHANGES_REQUESTED'), ('b', 'COMMENTED'), ('a', 'APPROVED')),
+            'q1': _reviews(('a', 'APPROVED'), ('b', 'CHANGES_REQUESTED')),
+            'q2': _reviews(('a', 'COMMENTED'))}}
+        mock_req = mock_requests()
+        mock_req.post.return_value = mock_res
+        mock_req.codes.ok = 200
+        pull_requests = [
+            {'html_url': 'https://github.com/imtf-devops/repo/pull/1', 'number': 1, 'repository_url': 'https://api.github.com/repos/imtf-devops/repo'},
+            {'html_url': 'https://github.com/imtf-devops/repo/pull/2', 'number': 2, 'repository_url': 'https://api.github.com/repos/imtf-devops/repo'},
+            {'html_url': 'https://github.com/imtf-devops/other/pull/3', 'number': 3, 'base': {'repo': {'full_name': 'imtf-devops/other'}}}]
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            self.assertEqual(gho.pull_requests_approved(pull_requests), {
+                'https://github.com/imtf-devops/repo/pull/1': True,
+                'https://github.com/imtf-devops/repo/pull/2': False,
+                'https://github.com/imtf-devops/other/pull/3': False})
+            mock_req.post.assert_called_once()
+            self.assertEqual(json.loads(mock_req.post.mock_calls[0].kwargs['data'])['variables']['n2'], 'other')
 
     def test_add_repo_variable(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -185,7 +469,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -197,7 +481,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'variables': [{"name": "NEWVAR", "value": "NEWVAL"}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -205,11 +489,70 @@ class InitTests(unittest.TestCase):
             self.assertEqual(ghr.list_variables(), [{"name": "NEWVAR", "value": "NEWVAL"}])
             mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/variables', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
+    def test_sync_repo_variables(self):
+        def _response(status_code, body, links=None):
+            res = requests.Response()
+            res.status_code = status_code
+            res._content = json.dumps(body).encode('utf-8')
+            if links:
+                res.headers['Link'] = links
+            return res
+        mock_req_get = mock.Mock(side_effect=[
+            _response(200, {'total_count': 3, 'variables': [{'name': 'SAME', 'value': '1'}, {'name': 'CHANGED', 'value': '1'}]},
+                      '<https://api.github.com/repositories/1/actions/variables?per_page=30&page=2>; rel="next"'),
+            _response(200, {'total_count': 3, 'variables': [{'name': 'OLD', 'value': '1'}]})] * 2)
+        mock_req_post = mock.Mock(return_value=_response(201, {}))
+        mock_req_patch = mock.Mock(return_value=_response(404, {'message': 'Not Found'}))
+        mock_req_delete = mock.Mock(return_value=_response(204, {}))
+        with mock.patch.multiple('github.requests.Session', get=mock_req_get, post=mock_req_post, patch=mock_req_patch, delete=mock_req_delete):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            desired = {'same': '1', 'CHANGED': '2', 'NEW': '3'}
+            plan = ghr.sync_variables(desired, dry_run=True)
+            self.assertEqual(plan, {'create': {'NEW': '3'}, 'update': {'CHANGED': '2'}, 'delete': ['OLD'], 'errors': {}})
+            mock_req_post.assert_not_called()
+            self.assertEqual(mock_req_get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/actions/variables?per_page=30')
+            plan = ghr.sync_variables(desired)
+            self.assertEqual(list(plan['errors']), ['CHANGED'])
+            mock_req_post.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/variables', data='{"name": "NEW", "value": "3"}', headers=mock.ANY, timeout=3)
+            mock_req_patch.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/variables/CHANGED', data='{"name": "CHANGED", "value": "2"}', headers=mock.ANY, timeout=3)
+            mock_req_delete.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/variables/OLD', headers=mock.ANY, timeout=3)
+
+    def test_iter_repo_issues(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {'next': {'url': 'https://api.github.com/repositories/1/issues?page=2'}}
+        mock_res.json.return_value = [{'number': 1}, {'number': 2}]
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            issues = ghr.iter_issues('closed', '2024-01-01T00:00:00Z', ['bug', 'ui'], per_page=2, max_items=3)
+            self.assertEqual([x['number'] for x in issues], [1, 2, 1])
+            self.assertEqual(mock_req.get.call_count, 2)
+            self.assertEqual(mock_req.get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/issues?per_page=2&state=closed&since=2024-01-01T00%3A00%3A00Z&labels=bug%2Cui')
+
+    def test_iter_repo_runners_variables(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
+        mock_res.json.return_value = {'total_count': 1, 'runners': [{'id': 1}], 'variables': [{'name': 'VAR'}]}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(list(ghr.iter_runners('runner-1')), [{'id': 1}])
+            self.assertEqual(list(ghr.iter_variables(per_page=100)), [{'name': 'VAR'}])
+            self.assertEqual([x.kwargs['url'] for x in mock_req.get.call_args_list], [
+                'https://api.github.com/repos/imtf-devops/reponame/actions/runners?per_page=100&name=runner-1',
+                'https://api.github.com/repos/imtf-devops/reponame/actions/variables?per_page=30'])
+
     def test_list_repo_secrets(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'secrets': [{"name": "NEWSECRET"}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -221,7 +564,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'runners': [{"id": 2}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -233,7 +576,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.delete.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -244,32 +587,76 @@ class InitTests(unittest.TestCase):
     def test_list_repo_runs(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.side_effect = [{'workflow_runs': ['runs-1', 'runs-2']}, {'workflow_runs': []}]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = {'workflow_runs': ['runs-1', 'runs-2']}
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertEqual(list(ghr.list_runs()), ['runs-1', 'runs-2'])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/repos/imtf-devops/reponame/actions/runs?per_page=100&page=1&', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/runs?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+
+    def test_list_repo_runs_prefetch(self):
+        def _get(url, **kwargs):
+            res = requests.Response()
+            res.status_code = 200
+            page = int(url.split('&page=')[1]) if '&page=' in url else 1
+            res._content = json.dumps({'workflow_runs': [f'runs-{page}-1', f'runs-{page}-2']}).encode()
+            if page == 1:
+                res.headers['Link'] = '<https://api.github.com/repositories/1/actions/runs?per_page=100&status=success&page=2>; rel="next", <https://api.github.com/repositories/1/actions/runs?per_page=100&status=success&page=4>; rel="last"'
+            return res
+        mock_req_get = mock.Mock(side_effect=_get)
+        with mock.patch('github.requests.Session.get', mock_req_get):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(list(ghr.list_runs(prefetch=2, status='success')), [f'runs-{p}-{i}' for p in range(1, 5) for i in (1, 2)])
+        self.assertEqual(mock_req_get.call_count, 4)
+        self.assertEqual(mock_req_get.call_args_list[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/actions/runs?per_page=100&status=success')
+        self.assertIn(mock.call(url='https://api.github.com/repositories/1/actions/runs?per_page=100&status=success&page=3', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3), mock_req_get.mock_calls)
+
+    def test_list_repo_commits_prefetch_single_page(self):
+        mock_res = requests.Response()
+        mock_res.status_code = 200
+        mock_res._content = b'["commits-1"]'
+        mock_req_get = mock.Mock(return_value=mock_res)
+        with mock.patch('github.requests.Session.get', mock_req_get):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(list(ghr.list_commits(prefetch=4)), ['commits-1'])
+        mock_req_get.assert_called_once()
+
+    def test_list_repo_runs_max_items(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {'next': {'url': 'https://api.github.com/repositories/1/actions/runs?page=2'}}
+        mock_res.json.return_value = {'workflow_runs': ['runs-1', 'runs-2']}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(list(ghr._paginate('actions/runs', {'branch': 'feature/a b', 'event': None}, key='workflow_runs', max_items=3)), ['runs-1', 'runs-2', 'runs-1'])
+            self.assertEqual(mock_req.get.call_count, 2)
+            self.assertEqual(mock_req.get.call_args_list[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/actions/runs?per_page=100&branch=feature%2Fa+b')
+            self.assertEqual(mock_req.get.call_args_list[1].kwargs['url'], 'https://api.github.com/repositories/1/actions/runs?page=2')
 
     def test_list_repo_commits(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.side_effect = [['commits-1', 'commits-2'], []]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = ['commits-1', 'commits-2']
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertEqual(list(ghr.list_commits()), ['commits-1', 'commits-2'])
-            self.assertEqual(mock_req.get.mock_calls[0], mock.call(url='https://api.github.com/repos/imtf-devops/reponame/commits?per_page=100&page=1', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3))
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/commits?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
     def test_get_repo_run(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'id': 2}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -281,7 +668,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = [{'id': 2}]
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -293,7 +680,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = [{'id': 2}]
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -305,7 +692,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -317,7 +704,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = [{'id': 2}]
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -328,44 +715,59 @@ class InitTests(unittest.TestCase):
     def test_get_repo_get_pull_request_approved(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
         mock_res.json.return_value = [{'state': 'APPROVED'}]
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertTrue(ghr.pull_request_approved(2))
-            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
     def test_get_repo_get_pull_request_not_approved(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.return_value = [{}, {'state': 'CHANGES_REQUESTED'}, {'state': 'APPROVED'}]
-        mock_req = mock.Mock()
+        mock_res.links = {}
+        mock_res.json.return_value = [{}, {'state': 'CHANGES_REQUESTED', 'user': {'login': 'a'}}, {'state': 'APPROVED', 'user': {'login': 'b'}}]
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertFalse(ghr.pull_request_approved(2))
-            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+
+    def test_get_repo_get_pull_request_approved_after_changes(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
+        mock_res.json.return_value = [{'state': 'CHANGES_REQUESTED', 'user': {'login': 'a'}}, {'state': 'COMMENTED', 'user': {'login': 'b'}}, {'state': 'APPROVED', 'user': {'login': 'a'}}]
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertTrue(ghr.pull_request_approved(2))
 
     def test_get_repo_get_pull_request_no_reviews(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
         mock_res.json.return_value = []
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertFalse(ghr.pull_request_approved(2))
-            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/pulls/2/reviews?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
     def test_get_repo_browse(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = [{'file': 'toto.yaml', 'path': "/My Folder"}]
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -377,7 +779,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.created
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.post.return_value = mock_res
         mock_req.codes.created = 201
         with mock.patch('github.requests', mock_req):
@@ -389,7 +791,7 @@ class InitTests(unittest.TestCase):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'sha': 'abcde'}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -400,22 +802,53 @@ class InitTests(unittest.TestCase):
     def test_get_repo_artifact(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
-        mock_res.json.return_value = {'artifacts': [
-            {'workflow_run': {'id': 1}, 'name': 'artifact1'},
+        mock_res.links = {}
+        mock_res.json.return_value = {'total_count': 1, 'artifacts': [
             {'workflow_run': {'id': 2}, 'name': 'artifact2'}]}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
             ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
             self.assertEqual(ghr.list_artifacts(2), [{'workflow_run': {'id': 2}, 'name': 'artifact2'}])
-            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/artifacts', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+            mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/runs/2/artifacts?per_page=100', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
+
+    def test_get_repo_artifact_name(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {'next': {'url': 'https://api.github.com/repositories/1/actions/runs/2/artifacts?per_page=100&name=artifact2&page=2'}}
+        mock_res.json.return_value = {'total_count': 2, 'artifacts': [{'name': 'artifact2', 'id': 1}]}
+        mock_res_2 = mock.Mock()
+        mock_res_2.status_code = requests.codes.ok
+        mock_res_2.links = {}
+        mock_res_2.json.return_value = {'total_count': 2, 'artifacts': [{'name': 'artifact2', 'id': 2}]}
+        mock_req = mock_requests()
+        mock_req.get.side_effect = [mock_res, mock_res_2]
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual([x['id'] for x in ghr.list_artifacts(2, 'artifact2')], [1, 2])
+            self.assertEqual(mock_req.get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/actions/runs/2/artifacts?per_page=100&name=artifact2')
+
+    def test_get_repo_artifact_cached(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
+        mock_res.json.return_value = {'total_count': 2, 'artifacts': [{'name': 'artifact1'}, {'name': 'artifact2'}]}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(ghr.list_artifacts(2, 'artifact1', cached=True), [{'name': 'artifact1'}])
+            self.assertEqual(ghr.list_artifacts(2, 'artifact2', cached=True), [{'name': 'artifact2'}])
+            mock_req.get.assert_called_once()
 
     def test_add_repo_secret(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.ok
         mock_res.json.return_value = {'key_id': '3380204578043523366', 'key': 'Ht9Cang4ervBBPvYhjQ78CooM/dTAlFJYWyVwnq90Eo='}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.put.return_value = mock_res
         mock_req.codes.ok = 200
@@ -425,14 +858,106 @@ class InitTests(unittest.TestCase):
             mock_req.get.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/secrets/public-key', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
             mock_req.put.assert_called_once_with(url='https://api.github.com/repos/imtf-devops/reponame/actions/secrets/secret_name', data=f'{{"encrypted_value": "{secret["encrypted_value"]}", "key_id": "3380204578043523366"}}', headers={'Authorization': 'Bearer TOKEN', 'Accept': 'application/vnd.github+json', 'X-GitHub-Api-Version': '2022-11-28'}, timeout=3)
 
+    def test_add_repo_secrets(self):
+        def _response(status_code, body=None):
+            res = requests.Response()
+            res.status_code = status_code
+            res._content = json.dumps(body).encode('utf-8')
+            return res
+        keys = [{'key_id': '1', 'key': 'Ht9Cang4ervBBPvYhjQ78CooM/dTAlFJYWyVwnq90Eo='}, {'key_id': '2', 'key': 'Ht9Cang4ervBBPvYhjQ78CooM/dTAlFJYWyVwnq90Eo='}]
+        mock_req_get = mock.Mock(side_effect=lambda **kwargs: _response(200, keys.pop(0)))
+
+        def _put(url, data, **kwargs):
+            if url.endswith('/FORBIDDEN'):
+                return _response(404, {'message': 'Not Found'})
+            if url.endswith('/ROTATED') and json.loads(data)['key_id'] == '1':
+                return _response(422, {'message': 'Bad key'})
+            return _response(201, {})
+        mock_req_put = mock.Mock(side_effect=_put)
+        with mock.patch('github.requests.Session.get', mock_req_get), mock.patch('github.requests.Session.put', mock_req_put):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            results = ghr.add_secrets({'A': 'a', 'B': 'b', 'FORBIDDEN': 'c'})
+            self.assertEqual(mock_req_get.call_count, 1)
+            self.assertEqual(mock_req_put.call_count, 3)
+            self.assertEqual(results['A']['name'], 'A')
+            self.assertIsInstance(results['FORBIDDEN'], requests.exceptions.HTTPError)
+            self.assertEqual(ghr.add_secret('ROTATED', 'd')['name'], 'ROTATED')
+            self.assertEqual(mock_req_get.call_count, 2)
+            self.assertEqual(json.loads(mock_req_put.mock_calls[-1].kwargs['data'])['key_id'], '2')
+
+    def test_add_org_repositories_secrets(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'key_id': '1', 'key': 'Ht9Cang4ervBBPvYhjQ78CooM/dTAlFJYWyVwnq90Eo='}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.put.return_value = mock_res
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            results = gho.add_repositories_secrets({'A': 'a', 'B': 'b'}, ['repo1', 'imtf-devops/repo2'])
+            self.assertEqual({x: sorted(y) for x, y in results.items()}, {'imtf-devops/repo1': ['A', 'B'], 'imtf-devops/repo2': ['A', 'B']})
+            self.assertEqual(sorted(x.kwargs['url'] for x in mock_req.get.call_args_list), [
+                'https://api.github.com/repos/imtf-devops/repo1/actions/secrets/public-key',
+                'https://api.github.com/repos/imtf-devops/repo2/actions/secrets/public-key'])
+            self.assertEqual(mock_req.put.call_count, 4)
+
+    def test_add_org_repositories_secrets_error(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.json.return_value = {'key_id': '1', 'key': 'Ht9Cang4ervBBPvYhjQ78CooM/dTAlFJYWyVwnq90Eo='}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.put.return_value = mock_res
+        mock_req.codes.ok = 200
+        add_secrets = github.GitHubRepository.add_secrets
+
+        def _add_secrets(repo, secrets, max_workers=8):
+            if repo.name.endswith('bad'):
+                raise ValueError('failed')
+            return add_secrets(repo, secrets, max_workers)
+        with mock.patch('github.requests', mock_req), mock.patch.object(github.GitHubRepository, 'add_secrets', _add_secrets):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            results = gho.add_repositories_secrets({'A': 'a'}, ['good', 'bad'])
+            self.assertEqual(sorted(results), ['imtf-devops/bad', 'imtf-devops/good'])
+            self.assertEqual(list(results['imtf-devops/good']), ['A'])
+            self.assertIsInstance(results['imtf-devops/bad'], ValueError)
+
+    def test_fan_out(self):
+        mock_res = mock.Mock()
+        mock_res.status_code = requests.codes.ok
+        mock_res.links = {}
+        mock_res.json.return_value = [{'full_name': f"imtf-devops/repo{x}"} for x in range(5)]
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res
+        mock_req.codes.ok = 200
+
+        def func(repo):
+            if repo.name.endswith('3'):
+                raise ValueError('failed')
+            return repo.name.upper()
+
+        with mock.patch('github.requests', mock_req):
+            gho = github.GitHubOrganization('TOKEN', 'imtf-devops')
+            progress = []
+            fan = gho.fan_out(func, max_workers=2, progress=lambda x: progress.append(x.completed))
+            self.assertEqual(sorted((x.name, y) for x, y in fan), [(x, x.upper()) for x in ['imtf-devops/repo0', 'imtf-devops/repo1', 'imtf-devops/repo2', 'imtf-devops/repo4']])
+            self.assertEqual((fan.submitted, fan.completed), (5, 5))
+            self.assertEqual(sorted(progress), [1, 2, 3, 4, 5])
+            self.assertEqual(list(fan.errors), ['imtf-devops/repo3'])
+            self.assertIsInstance(fan.errors['imtf-devops/repo3'], ValueError)
+            self.assertEqual(mock_req.get.call_count, 1)
+            self.assertEqual(gho.fan_out(lambda x: 1, ['repo1']).run(), {'imtf-devops/repo1': 1})
+
     def test_execute_workflow(self):
         mock_res_get = mock.Mock()
         mock_res_get.status_code = requests.codes.ok
-        mock_res_get.json.side_effect = [{'workflow_runs': [{'id': 0}]}, {'workflow_runs': []}, {'workflow_runs': [{'id': 0}, {'id': 1}]}, {'workflow_runs': []}, {'path': '.github/workflows/file.yaml'}]
+        mock_res_get.links = {}
+        mock_res_get.json.side_effect = [{'workflow_runs': [{'id': 0}]}, {'workflow_runs': [{'id': 0}, {'id': 1}]}, {'path': '.github/workflows/file.yaml'}]
         mock_res_post = mock.Mock()
         mock_res_post.status_code = requests.codes.no_content
         mock_res_post.json.side_effect = requests.exceptions.JSONDecodeError("Error", '{"toto":}', 7)
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res_get
         mock_req.codes.ok = 200
         mock_req.codes.no_content = 204
@@ -441,21 +966,87 @@ class InitTests(unittest.TestCase):
             with mock.patch('github.requests', mock_req):
                 ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
                 self.assertEqual(ghr.execute_workflow('file.yaml', {}, 'abc'), 1)
+                self.assertTrue(mock_req.get.mock_calls[0].kwargs['url'].startswith('https://api.github.com/repos/imtf-devops/reponame/actions/workflows/file.yaml/runs?per_page=100&event=workflow_dispatch'))
+                self.assertEqual(json.loads(mock_req.post.mock_calls[0].kwargs['data']), {'return_run_details': True})
+
+    def test_execute_workflow_run_details(self):
+        mock_res_post = mock.Mock()
+        mock_res_post.status_code = requests.codes.ok
+        mock_res_post.json.return_value = {'workflow_run_id': 42, 'run_url': 'https://api.github.com/repos/imtf-devops/reponame/actions/runs/42'}
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {}
+        mock_res_get.json.return_value = {'workflow_runs': []}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.post.return_value = mock_res_post
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(ghr.execute_workflow('file.yaml', {'ref': 'main'}, correlation_input='run_id'), 42)
+            mock_req.get.assert_not_called()
+            data = json.loads(mock_req.post.mock_calls[0].kwargs['data'])
+            self.assertEqual(data['inputs'], {'run_id': mock.ANY})
+            self.assertTrue(data['return_run_details'])
+
+    def test_execute_workflow_correlation(self):
+        mock_res_post = mock.Mock()
+        mock_res_post.status_code = requests.codes.no_content
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.post.return_value = mock_res_post
+        mock_req.codes.ok = 200
+        mock_req.codes.no_content = 204
+
+        def _runs():
+            token = json.loads(mock_req.post.mock_calls[0].kwargs['data'])['inputs']['run_id']
+            runs = [{'id': 2, 'display_title': 'deploy other'}]
+            if mock_res_get.json.call_count > 1:
+                runs.insert(0, {'id': 3, 'display_title': f'deploy {token}'})
+            return {'workflow_runs': runs}
+        mock_res_get.json.side_effect = _runs
+        with mock.patch('time.sleep', mock.Mock()) as mock_sleep:
+            with mock.patch('github.requests', mock_req):
+                ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+                self.assertEqual(ghr.execute_workflow('file.yaml', {'inputs': {'env': 'dev'}}, correlation_input='run_id'), 3)
+                mock_sleep.assert_called_once_with(1.0)
+
+    def test_execute_workflow_timeout(self):
+        mock_res_post = mock.Mock()
+        mock_res_post.status_code = requests.codes.no_content
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.links = {}
+        mock_res_get.json.return_value = {'workflow_runs': []}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.post.return_value = mock_res_post
+        mock_req.codes.ok = 200
+        mock_req.codes.no_content = 204
+        with mock.patch('time.sleep', mock.Mock()), mock.patch('time.monotonic', mock.Mock(side_effect=[0, 5, 5, 12])):
+            with mock.patch('github.requests', mock_req):
+                ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+                with self.assertRaises(TimeoutError):
+                    ghr.execute_workflow('file.yaml', {}, timeout=10)
 
     def test_execute_workflow_exception(self):
         res = requests.Response()
         res.status_code = 422
         mock_res_get = mock.Mock()
         mock_res_get.status_code = requests.codes.ok
-        mock_res_get.json.side_effect = [{'workflow_runs': []}, {'workflow_runs': [{'id': 1}]}, {'workflow_runs': []}, {'path': '.github/workflows/file.yaml'}]
+        mock_res_get.links = {}
+        mock_res_get.json.side_effect = [{'workflow_runs': []}, {'workflow_runs': [{'id': 1}]}, {'path': '.github/workflows/file.yaml'}]
         mock_res_post = mock.Mock()
         mock_res_post.status_code = requests.codes.no_content
         mock_req_get = mock.Mock()
         mock_req_get.return_value = mock_res_get
         mock_req_post = mock.Mock()
         mock_req_post.side_effect = requests.exceptions.HTTPError(response=res)
-        with mock.patch('github.requests.get', mock_req_get):
-            with mock.patch('github.requests.post', mock_req_post):
+        with mock.patch('github.requests.Session.get', mock_req_get):
+            with mock.patch('github.requests.Session.post', mock_req_post):
                 ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
                 self.assertEqual(ghr.execute_workflow('file.yaml', {}, 'abc'), 0)
 
@@ -464,25 +1055,304 @@ class InitTests(unittest.TestCase):
         res.status_code = 421
         mock_res_get = mock.Mock()
         mock_res_get.status_code = requests.codes.ok
-        mock_res_get.json.side_effect = [{'workflow_runs': []}, {'workflow_runs': [{'id': 1}]}, {'workflow_runs': []}, {'path': '.github/workflows/file.yaml'}]
+        mock_res_get.links = {}
+        mock_res_get.json.side_effect = [{'workflow_runs': []}, {'workflow_runs': [{'id': 1}]}, {'path': '.github/workflows/file.yaml'}]
         mock_res_post = mock.Mock()
         mock_res_post.status_code = requests.codes.no_content
         mock_req_get = mock.Mock()
         mock_req_get.return_value = mock_res_get
         mock_req_post = mock.Mock()
         mock_req_post.side_effect = requests.exceptions.HTTPError(response=res)
-        with mock.patch('github.requests.get', mock_req_get):
-            with mock.patch('github.requests.post', mock_req_post):
+        with mock.patch('github.requests.Session.get', mock_req_get):
+            with mock.patch('github.requests.Session.post', mock_req_post):
                 with self.assertRaises(requests.exceptions.HTTPError):
                     ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
                     ghr.execute_workflow('file.yaml', {}, 'abc')
 
+    def test_download(self):
+        data = b'0123456789'
+        progress = mock.Mock()
+        mock_req_get = mock.Mock(return_value=stream_response(data))
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            output = os.path.join(tmp, 'file')
+            digest = ghr.download('https://api.github.com/file', output, chunk_size=4, progress=progress, sha256=hashlib.sha256(data).hexdigest())
+            self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+            with open(output, 'rb') as fd:
+                self.assertEqual(fd.read(), data)
+            self.assertEqual(os.listdir(tmp), ['file'])
+        self.assertTrue(mock_req_get.mock_calls[0].kwargs['stream'])
+        self.assertEqual(progress.mock_calls, [mock.call(4, 10), mock.call(8, 10), mock.call(10, 10)])
+
+    def test_download_hooks(self):
+        data = b'0123456789'
+        events = []
+        mock_req_get = mock.Mock(side_effect=[
+            stream_response(data, url='https://storage.example.com/file?sig=1', drop_after=4),
+            stream_response(data[4:], status_code=206, url='https://storage.example.com/file?sig=1')])
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            session = github.GitHubSession(hooks=[events.append])
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame', session=session)
+            ghr.download('https://api.github.com/repos/imtf-devops/reponame/actions/artifacts/1/zip', os.path.join(tmp, 'file'), chunk_size=2)
+        self.assertEqual([(x['kind'], x['endpoint'], x['status']) for x in events], [
+            ('request', '/repos/{owner}/{repo}/actions/artifacts/{id}/zip', 200),
+            ('request', 'storage.example.com', 206),
+            ('download', '/repos/{owner}/{repo}/actions/artifacts/{id}/zip', 200)])
+        self.assertEqual(events[1]['url'], 'https://storage.example.com/file?sig=***')
+        self.assertEqual((events[2]['response_bytes'], events[2]['retries']), (10, 1))
+
+    def test_download_resume(self):
+        data = b'0123456789'
+        mock_req_get = mock.Mock(side_effect=[
+            stream_response(data, url='https://storage.example.com/file?sig=1', drop_after=4),
+            stream_response(data[4:], status_code=206, url='https://storage.example.com/file?sig=1')])
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            output = os.path.join(tmp, 'file')
+            self.assertEqual(ghr.download('https://api.github.com/file', output, chunk_size=2), hashlib.sha256(data).hexdigest())
+            with open(output, 'rb') as fd:
+                self.assertEqual(fd.read(), data)
+        kwargs = mock_req_get.mock_calls[1].kwargs
+        self.assertEqual(kwargs['url'], 'https://storage.example.com/file?sig=1')
+        self.assertEqual(kwargs['headers']['Range'], 'bytes=4-')
+        self.assertNotIn('Authorization', kwargs['headers'])
+
+    def test_download_segments(self):
+        data = bytes(range(100))
+
+        def _get(url, headers, **kwargs):
+            if 'Range' not in headers:
+                return stream_response(data)
+            start, end = [int(x) for x in headers['Range'][6:].split('-')]
+            return stream_response(data[start:end + 1], status_code=206)
+        mock_req_get = mock.Mock(side_effect=_get)
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            output = os.path.join(tmp, 'file')
+            self.assertEqual(ghr.download('https://api.github.com/file', output, chunk_size=8, segments=3), hashlib.sha256(data).hexdigest())
+            with open(output, 'rb') as fd:
+                self.assertEqual(fd.read(), data)
+        self.assertEqual(sorted(x.kwargs['headers'].get('Range', '') for x in mock_req_get.mock_calls), ['', 'bytes=0-33', 'bytes=34-67', 'bytes=68-99'])
+
+    def test_download_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            output = os.path.join(tmp, 'file')
+            with mock.patch('github.requests.Session.get', mock.Mock(return_value=stream_response(b'', status_code=404))):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    ghr.download('https://api.github.com/file', output)
+            with mock.patch('github.requests.Session.get', mock.Mock(return_value=stream_response(b'data'))):
+                with self.assertRaises(ValueError):
+                    ghr.download('https://api.github.com/file', output, sha256='0' * 64)
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_clone_zip(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_ref:
+            zip_ref.writestr('reponame-abc/', '')
+            zip_ref.writestr('reponame-abc/README.md', 'readme')
+            zip_ref.writestr('reponame-abc/src/main.py', 'main')
+            zip_ref.writestr('reponame-abc/../evil', 'evil')
+        mock_req_get = mock.Mock(return_value=stream_response(archive.getvalue()))
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            ghr.clone(os.path.join(tmp, 'repo'), 'main', paths=['src/*'])
+            self.assertEqual(os.listdir(tmp), ['repo'])
+            self.assertEqual(os.listdir(os.path.join(tmp, 'repo')), ['src'])
+            with open(os.path.join(tmp, 'repo', 'src', 'main.py'), encoding='utf-8') as fd:
+                self.assertEqual(fd.read(), 'main')
+        self.assertEqual(mock_req_get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/zipball/main')
+
+    def test_clone_zip_symlinks(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zip_ref:
+            zip_ref.writestr('reponame-abc/README.md', 'readme')
+            for name, target in (('link', 'README.md'), ('escape', '../../outside')):
+                info = zipfile.ZipInfo(f'reponame-abc/{name}')
+                info.external_attr = (0o120777 << 16)
+                zip_ref.writestr(info, target)
+        mock_req_get = mock.Mock(return_value=stream_response(archive.getvalue()))
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            ghr.clone(tmp, 'main')
+            self.assertEqual(sorted(os.listdir(tmp)), ['README.md', 'link'])
+            self.assertEqual(os.readlink(os.path.join(tmp, 'link')), 'README.md')
+
+    def test_clone_tar(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as tar_ref:
+            for name, content, mode in (('reponame-abc/README.md', b'readme', 0o644), ('reponame-abc/run.sh', b'#!/bin/sh', 0o755)):
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                info.mode = mode
+                tar_ref.addfile(info, io.BytesIO(content))
+            info = tarfile.TarInfo('reponame-abc/link')
+            info.type = tarfile.SYMTYPE
+            info.linkname = 'README.md'
+            tar_ref.addfile(info)
+        mock_req_get = mock.Mock(return_value=stream_response(archive.getvalue()))
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            ghr.clone(tmp, 'v1', archive='tar')
+            self.assertEqual(sorted(os.listdir(tmp)), ['README.md', 'link', 'run.sh'])
+            self.assertTrue(os.access(os.path.join(tmp, 'run.sh'), os.X_OK))
+            self.assertFalse(os.access(os.path.join(tmp, 'README.md'), os.X_OK))
+            self.assertEqual(os.readlink(os.path.join(tmp, 'link')), 'README.md')
+        self.assertEqual(mock_req_get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/tarball/v1')
+        self.assertTrue(mock_req_get.mock_calls[0].kwargs['stream'])
+
+    def test_sync(self):
+        blobs = {'s1': b'readme', 's2': b'main', 's3': b'lib', 's4': b'main v2', 's5': b'#!/bin/sh'}
+        trees = [
+            [('README.md', 's1', '100644'), ('src/main.py', 's2', '100644'), ('src/lib/lib.py', 's3', '100644'), ('docs/index.md', 's1', '100644')],
+            [('README.md', 's1', '100644'), ('src/main.py', 's4', '100644'), ('run.sh', 's5', '100755'), ('docs/index.md', 's1', '100644')]]
+
+        def _get(url, headers, **kwargs):
+            if '/git/trees/' in url:
+                res = requests.Response()
+                res.status_code = 200
+                res._content = json.dumps({'sha': f'tree{len(trees)}', 'truncated': False, 'tree': [
+                    {'path': 'src', 'type': 'tree', 'sha': 't', 'mode': '040000'}] + [
+                    {'path': path, 'type': 'blob', 'sha': sha, 'mode': mode} for path, sha, mode in trees.pop(0)]}).encode('utf-8')
+                return res
+            self.assertEqual(headers['Accept'], 'application/vnd.github.raw+json')
+            return stream_response(blobs[url.rsplit('/', 1)[1]])
+        mock_req_get = mock.Mock(side_effect=_get)
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            self.assertEqual(ghr.sync(tmp, 'main', paths=['src/*', 'README.md', '*.sh']), {'added': ['README.md', 'src/main.py', 'src/lib/lib.py'], 'updated': [], 'deleted': []})
+            self.assertEqual(mock_req_get.call_count, 4)
+            self.assertEqual(mock_req_get.mock_calls[0].kwargs['url'], 'https://api.github.com/repos/imtf-devops/reponame/git/trees/main?recursive=1')
+            mock_req_get.reset_mock()
+            self.assertEqual(ghr.sync(tmp, 'main', paths=['src/*', 'README.md', '*.sh']), {'added': ['run.sh'], 'updated': ['src/main.py'], 'deleted': ['src/lib/lib.py']})
+            self.assertEqual(mock_req_get.call_count, 3)
+            self.assertFalse(os.path.exists(os.path.join(tmp, 'src', 'lib')))
+            self.assertFalse(os.path.exists(os.path.join(tmp, 'docs')))
+            self.assertTrue(os.access(os.path.join(tmp, 'run.sh'), os.X_OK))
+            with open(os.path.join(tmp, 'src', 'main.py'), 'rb') as fd:
+                self.assertEqual(fd.read(), b'main v2')
+
+    def test_sync_type_change(self):
+        blobs = {'s1': b'file a', 's2': b'file a/b', 's3': b'file x/y', 's4': b'file x'}
+        trees = [[('a', 's1'), ('x/y', 's3')], [('a/b', 's2'), ('x', 's4')]]
+
+        def _get(url, headers, **kwargs):
+            if '/git/trees/' in url:
+                res = requests.Response()
+                res.status_code = 200
+                res._content = json.dumps({'sha': f'tree{len(trees)}', 'truncated': False, 'tree': [
+                    {'path': path, 'type': 'blob', 'sha': sha, 'mode': '100644'} for path, sha in trees.pop(0)]}).encode('utf-8')
+                return res
+            return stream_response(blobs[url.rsplit('/', 1)[1]])
+        with mock.patch('github.requests.Session.get', mock.Mock(side_effect=_get)), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            ghr.sync(tmp, 'main')
+            # untracked file keeping the x directory after x/y is deleted
+            with open(os.path.join(tmp, 'x', 'untracked'), 'wb') as fd:
+                fd.write(b'local')
+            self.assertEqual(ghr.sync(tmp, 'main'), {'added': ['a/b', 'x'], 'updated': [], 'deleted': ['a', 'x/y']})
+            for path, content in [('a/b', b'file a/b'), ('x', b'file x')]:
+                with open(os.path.join(tmp, path), 'rb') as fd:
+                    self.assertEqual(fd.read(), content)
+            with open(os.path.join(tmp, '.github-sync.json'), encoding='utf-8') as fd:
+                self.assertIn('a/b', json.load(fd)['files'])
+
+    def test_sync_symlinks(self):
+        blobs = {'s1': b'file', 's2': b'file.txt', 's3': b'../../outside'}
+
+        def _get(url, headers, **kwargs):
+            if '/git/trees/' in url:
+                res = requests.Response()
+                res.status_code = 200
+                res._content = json.dumps({'sha': 'tree', 'truncated': False, 'tree': [
+                    {'path': 'file.txt', 'type': 'blob', 'sha': 's1', 'mode': '100644'},
+                    {'path': 'link', 'type': 'blob', 'sha': 's2', 'mode': '120000'},
+                    {'path': 'dir/escape', 'type': 'blob', 'sha': 's3', 'mode': '120000'}]}).encode('utf-8')
+                return res
+            return stream_response(blobs[url.rsplit('/', 1)[1]])
+        with mock.patch('github.requests.Session.get', mock.Mock(side_effect=_get)), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            ghr.sync(tmp, 'main')
+            self.assertEqual(os.readlink(os.path.join(tmp, 'link')), 'file.txt')
+            self.assertFalse(os.path.lexists(os.path.join(tmp, 'dir', 'escape')))
+
+    def test_export_variables(self):
+        def _artifact(**files):
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w') as zip_ref:
+                for name, content in files.items():
+                    zip_ref.writestr(name, content)
+            return stream_response(archive.getvalue())
+        mock_req_get = mock.Mock(side_effect=lambda url, **kwargs: {
+            'https://api.github.com/a1': _artifact(version='1.2.3\nignored\n'),
+            'https://api.github.com/a2': _artifact(**{'image-tag': 'abc '})}[url])
+        with mock.patch('github.requests.Session.get', mock_req_get), tempfile.TemporaryDirectory() as tmp:
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            output = os.path.join(tmp, 'variables')
+            ghr.export_variables('https://api.github.com/a1', 'build', output)
+            ghr.export_variables('https://api.github.com/a2', 'build', output)
+            with open(output, encoding='utf-8') as fd:
+                self.assertEqual(fd.read(), 'REPONAME_BUILD_VERSION=1.2.3\nREPONAME_VERSION=1.2.3\nREPONAME_BUILD_IMAGE_TAG=abc\nREPONAME_IMAGE_TAG=abc\n')
+            ghr.export_artifacts_variables([('https://api.github.com/a2', 'docker'), ('https://api.github.com/a1', 'build')], output, 'app')
+            with open(output, encoding='utf-8') as fd:
+                self.assertEqual(fd.read(), 'APP_DOCKER_IMAGE_TAG=abc\nAPP_IMAGE_TAG=abc\nAPP_BUILD_VERSION=1.2.3\nAPP_VERSION=1.2.3\n')
+            self.assertEqual(os.listdir(tmp), ['variables'])
+        self.assertTrue(all(x.kwargs['stream'] for x in mock_req_get.call_args_list))
+
+    def test_create_pull_request(self):
+        def _response(body):
+            res = mock.Mock()
+            res.status_code = requests.codes.created
+            res.json.return_value = body
+            return res
+
+        def _post(url, data, **kwargs):
+            data = json.loads(data)
+            if url.endswith('/git/blobs'):
+                return _response({'sha': hashlib.sha1(base64.b64decode(data['content'])).hexdigest()})
+            if url.endswith('/git/refs'):
+                return _response({'object': {'sha': 'commit0'}})
+            if url.endswith('/git/trees'):
+                return _response({'sha': f"tree-{data['base_tree']}"})
+            if url.endswith('/git/commits'):
+                return _response({'sha': 'commit1'})
+            return _response({'html_url': 'https://github.com/imtf-devops/reponame/pull/1'})
+        mock_res_get = mock.Mock()
+        mock_res_get.status_code = requests.codes.ok
+        mock_res_get.json.return_value = {'sha': 'tree0'}
+        mock_req = mock_requests()
+        mock_req.get.return_value = mock_res_get
+        mock_req.post.side_effect = _post
+        mock_req.patch.return_value = _response({})
+        mock_req.codes.ok = 200
+        with mock.patch('github.requests', mock_req):
+            ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+            files = {
+                'README.md': 'readme',
+                'big.txt': 'x' * 20,
+                'image.png': b'\x89PNG',
+                'run.sh': {'content': '#!/bin/sh', 'mode': '100755'},
+                'old.txt': None}
+            self.assertEqual(ghr.create_pull_request('feature', 'message', files, 'main', inline_limit=10, max_tree_entries=3), 'https://github.com/imtf-devops/reponame/pull/1')
+        posts = [(x.kwargs['url'].rsplit('/', 1)[1], json.loads(x.kwargs['data'])) for x in mock_req.post.mock_calls]
+        self.assertEqual(sorted(base64.b64decode(data['content']) for url, data in posts if url == 'blobs'), [b'x' * 20, b'\x89PNG'])
+        trees = [data for url, data in posts if url == 'trees']
+        self.assertEqual([tree['base_tree'] for tree in trees], ['commit0', 'tree-commit0'])
+        self.assertEqual(trees[0]['tree'], [
+            {'path': 'README.md', 'mode': '100644', 'type': 'blob', 'content': 'readme'},
+            {'path': 'big.txt', 'mode': '100644', 'type': 'blob', 'sha': hashlib.sha1(b'x' * 20).hexdigest()},
+            {'path': 'image.png', 'mode': '100644', 'type': 'blob', 'sha': hashlib.sha1(b'\x89PNG').hexdigest()}])
+        self.assertEqual(trees[1]['tree'], [
+            {'path': 'run.sh', 'mode': '100755', 'type': 'blob', 'content': '#!/bin/sh'},
+            {'path': 'old.txt', 'mode': '100644', 'type': 'blob', 'sha': None}])
+        self.assertEqual(posts[-2][1]['tree'], 'tree-tree-commit0')
+
     def test_requests_wrong_status_code(self):
         mock_res = mock.Mock()
         mock_res.status_code = requests.codes.not_found
         mock_res.raise_for_status.side_effect = requests.exceptions.HTTPError
         mock_res.json.return_value = {}
-        mock_req = mock.Mock()
+        mock_req = mock_requests()
         mock_req.get.return_value = mock_res
         mock_req.codes.ok = 200
         with mock.patch('github.requests', mock_req):
@@ -0,0 +1,110 @@
+import os
+import sys
+import asyncio
+import unittest
+import requests
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import github.retry
+
+
+def response(status_code, headers=None, text=''):
+    res = requests.Response()
+    res.status_code = status_code
+    res.headers.update(headers or {})
+    res._content = text.encode('utf-8')
+    return res
+
+
+class RetryTests(unittest.TestCase):
+    def test_backoff(self):
+        policy = github.retry.RetryPolicy(backoff_factor=2, max_backoff=10, jitter=False)
+        self.assertEqual([policy.backoff(x) for x in range(1, 5)], [2, 4, 8, 10])
+
+    def test_max_attempts(self):
+        policy = github.retry.RetryPolicy(max_attempts=2, jitter=False)
+        self.assertEqual(policy.delay('get', 1, response=response(502)), 1)
+        self.assertIsNone(policy.delay('get', 2, response=response(502)))
+
+    def test_non_idempotent(self):
+        policy = github.retry.RetryPolicy(jitter=False)
+        self.assertIsNone(policy.delay('post', 1, response=response(502)))
+        self.assertIsNone(policy.delay('post', 1, error=requests.exceptions.ReadTimeout()))
+        self.assertEqual(policy.delay('post', 1, error=requests.exceptions.ConnectTimeout()), 1)
+        self.assertEqual(policy.delay('get', 1, error=requests.exceptions.ReadTimeout()), 1)
+
+    def test_primary_rate_limit(self):
+        policy = github.retry.RetryPolicy()
+        with mock.patch('time.time', mock.Mock(return_value=1000)):
+            self.assertEqual(policy.delay('post', 1, response=response(
+                403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1030'})), 31)
+            self.assertIsNone(policy.delay('get', 1, response=response(
+                403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '999999'})))
+
+    def test_secondary_rate_limit(self):
+        policy = github.retry.RetryPolicy()
+        self.assertEqual(policy.delay('get', 1, response=response(403, {'Retry-After': '12'})), 12)
+        self.assertEqual(policy.delay('get', 1, response=response(
+            403, text='{"message": "You have exceeded a secondary rate limit."}')), 60)
+        self.assertIsNone(policy.delay('get', 1, response=response(403, text='Forbidden')))
+        self.assertIsNone(policy.delay('get', 1, response=response(404)))
+
+
+class SearchQuotaTests(unittest.TestCase):
+    @mock.patch('github.retry.time.sleep')
+    @mock.patch('github.retry.time.time')
+    def test_sliding_window(self, mock_time, mock_sleep):
+        mock_time.side_effect = [100, 101, 102, 160]
+        quota = github.retry.SearchQuota(limit=2, period=60)
+        quota.acquire()
+        quota.acquire()
+        quota.acquire()
+        mock_sleep.assert_called_once_with(58)
+
+    @mock.patch('github.retry.time.sleep')
+    @mock.patch('github.retry.time.time')
+    def test_server_quota(self, mock_time, mock_sleep):
+        mock_time.side_effect = [100, 130]
+        quota = github.retry.SearchQuota()
+        quota.update(response(200, {'X-RateLimit-Resource': 'search', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '130'}))
+        quota.acquire()
+        mock_sleep.assert_called_once_with(30)
+        quota.update(response(200, {'X-RateLimit-Resource': 'core', 'X-RateLimit-Remaining': '0'}))
+        self.assertEqual(quota._remaining, 0)
+
+    @mock.patch('github.retry.asyncio.sleep', new_callable=mock.AsyncMock)
+    @mock.patch('github.retry.time.time')
+    def test_async_sliding_window(self, mock_time, mock_sleep):
+        mock_time.side_effect = [100, 101, 160]
+        quota = github.retry.SearchQuota(limit=1, period=60)
+        asyncio.run(quota.aacquire())
+        asyncio.run(quota.aacquire())
+        mock_sleep.assert_awaited_once_with(59)
+
+    def test_code_search_resource(self):
+        quota = github.retry.SearchQuota(limit=10, resource='code_search')
+        quota.update(response(200, {'X-RateLimit-Resource': 'search', 'X-RateLimit-Remaining': '29'}))
+        self.assertIsNone(quota._remaining)
+        quota.update(response(200, {'X-RateLimit-Resource': 'code_search', 'X-RateLimit-Remaining': '9'}))
+        self.assertEqual(quota._remaining, 9)
+
+
+
+class RateBudgetTests(unittest.TestCase):
+    @mock.patch('github.retry.time.sleep')
+    @mock.patch('github.retry.time.time')
+    def test_reserve(self, mock_time, mock_sleep):
+        mock_time.side_effect = [100, 100, 100, 131]
+        budget = github.retry.RateBudget()
+        budget.wait(100)
+        budget.update(response(200, {'X-RateLimit-Remaining': '50', 'X-RateLimit-Reset': '130'}))
+        budget.update(response(200, {'X-RateLimit-Resource': 'search', 'X-RateLimit-Remaining': '0'}))
+        self.assertEqual(budget.remaining, 50)
+        budget.wait(10)
+        budget.wait(100)
+        mock_sleep.assert_called_once_with(31)
+
+if __name__ == "__main__":
+    unittest.main()
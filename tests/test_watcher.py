@@ -0,0 +1,83 @@
+import os
+import sys
+import asyncio
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import github
+import github.watcher
+
+
+def run(run_id, status, conclusion=None, created_at='2024-01-01T00:00:00Z'):
+    return {'id': run_id, 'status': status, 'conclusion': conclusion, 'created_at': created_at}
+
+
+class WatcherTests(unittest.TestCase):
+    def test_poll(self):
+        repository = mock.Mock()
+        repository.list_runs.side_effect = [
+            iter([run(3, 'queued'), run(2, 'in_progress', created_at='2023-12-31T00:00:00Z')]),
+            iter([run(3, 'completed', 'success'), run(2, 'in_progress', created_at='2023-12-31T00:00:00Z')])]
+        repository.get_run.return_value = run(1, 'completed', 'failure')
+        callback = mock.Mock()
+        watcher = github.watcher.RunWatcher(repository)
+        futures = [watcher.watch(x, callback) for x in (1, 2, 3)]
+        watcher.poll()
+        repository.list_runs.assert_called_once_with(max_items=100)
+        repository.get_run.assert_called_once_with(1)
+        self.assertEqual(futures[0].result(0), run(1, 'completed', 'failure'))
+        self.assertEqual(len(watcher), 2)
+        watcher.poll()
+        repository.list_runs.assert_called_with(created='>=2023-12-31T00:00:00Z', max_items=100)
+        self.assertEqual(futures[2].result(0)['conclusion'], 'success')
+        self.assertFalse(futures[1].done())
+        self.assertEqual(callback.call_count, 4)
+
+    def test_poll_bounded(self):
+        repository = mock.Mock()
+        repository.list_runs.side_effect = [
+            iter([run(2, 'in_progress'), run(1, 'in_progress')]),
+            iter([run(3, 'queued'), run(2, 'completed', 'success')])]
+        repository.get_run.return_value = run(1, 'completed', 'success')
+        watcher = github.watcher.RunWatcher(repository, page_size=2)
+        futures = [watcher.watch(x) for x in (1, 2)]
+        watcher.poll()
+        watcher.poll()
+        repository.list_runs.assert_called_with(created='>=2024-01-01T00:00:00Z', max_items=2)
+        repository.get_run.assert_called_once_with(1)
+        self.assertTrue(all(future.done() for future in futures))
+
+    @mock.patch('github.watcher.time.time')
+    def test_next_interval(self, mock_time):
+        mock_time.return_value = 1704067200 + 300
+        watcher = github.watcher.RunWatcher(mock.Mock(), min_interval=5, max_interval=60)
+        self.assertEqual(watcher.next_interval(), 5)
+        watcher.watch(1)
+        watcher._update(run(1, 'in_progress'))
+        self.assertEqual(watcher.next_interval(), 30)
+        mock_time.return_value += 3600
+        self.assertEqual(watcher.next_interval(), 60)
+
+    def test_arun(self):
+        repository = mock.Mock()
+        repository.list_runs.side_effect = [iter([run(1, 'in_progress')]), iter([run(1, 'completed', 'success')])]
+        watcher = github.watcher.RunWatcher(repository, min_interval=0, max_interval=0)
+        future = watcher.watch(1)
+
+        async def _main():
+            await watcher.arun(timeout=5)
+            return await asyncio.wrap_future(future)
+        self.assertEqual(asyncio.run(_main())['conclusion'], 'success')
+
+    def test_watch_runs(self):
+        ghr = github.GitHubRepository('TOKEN', 'imtf-devops/reponame')
+        watcher = ghr.watch_runs([1, 2])
+        self.assertEqual(len(watcher), 2)
+        self.assertIsInstance(watcher.repository.cache, github.MemoryCache)
+        self.assertIs(watcher.repository.session, ghr.session)
+
+
+if __name__ == "__main__":
+    unittest.main()